@@ -0,0 +1,107 @@
+import functools
+import logging
+import threading
+from contextlib import ExitStack, contextmanager
+from importlib import import_module
+
+from django.conf import settings
+from django.db import connections
+from django.urls import URLPattern, URLResolver
+
+logger = logging.getLogger(__name__)
+
+# Управление транзакциями зависит от окружения (тестовый прогон
+# открывает точки сохранения), поэтому в бюджет не входит
+TRANSACTION_STATEMENTS = (
+    'BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE SAVEPOINT',
+)
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter:
+    """Считает запросы ко всем базам, пока открыт контекст."""
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not (
+            getattr(_local, 'exempt', 0)
+            or sql.lstrip().upper().startswith(TRANSACTION_STATEMENTS)
+        ):
+            self.count += 1
+            self.statements.append(sql)
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self.stack = ExitStack()
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stack.close()
+
+
+@contextmanager
+def exempt_from_budget():
+    """Запросы внутри блока не входят в бюджет представления. Для
+    редких холодных путей вроде построения миниатюры по требованию."""
+    _local.exempt = getattr(_local, 'exempt', 0) + 1
+    try:
+        yield
+    finally:
+        _local.exempt -= 1
+
+
+def query_budget(limit):
+    """Объявляет, сколько запросов к базе может сделать представление.
+
+    При превышении пишет предупреждение в лог core.budgets или, если
+    QUERY_BUDGET_RAISE, бросает QueryBudgetExceeded со списком запросов.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            with QueryCounter() as counter:
+                response = view(request, *args, **kwargs)
+            if counter.count > limit:
+                message = (
+                    f'{view.__module__}.{view.__qualname__}: '
+                    f'{counter.count} запросов при бюджете {limit}'
+                )
+                if settings.QUERY_BUDGET_RAISE:
+                    raise QueryBudgetExceeded(
+                        '\n'.join([message, *counter.statements])
+                    )
+                logger.warning(message)
+            return response
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
+
+
+def iter_patterns(urlconf):
+    """Все URLPattern модуля адресов, включая вложенные include()."""
+    patterns = import_module(urlconf).urlpatterns
+    stack = list(patterns)
+    while stack:
+        pattern = stack.pop(0)
+        if isinstance(pattern, URLResolver):
+            stack.extend(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            yield pattern
+
+
+def unbudgeted_views(urlconf):
+    """Имена адресов, представления которых не объявили бюджет."""
+    return [
+        pattern.name for pattern in iter_patterns(urlconf)
+        if getattr(pattern.callback, 'query_budget', None) is None
+    ]
@@ -0,0 +1,95 @@
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+
+LOCK_POLL_INTERVAL = 0.05
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+@contextmanager
+def locked(key, cache=None):
+    """Блокировка ключа в общем кэше на время чтения и записи значения.
+    Ждёт, пока её отпустит другой процесс; блокировка упавшего процесса
+    истекает через CACHE_LOCK_TIMEOUT."""
+    cache = cache or default_cache
+    lock_key = _lock_key(key)
+    while not cache.add(lock_key, 1, settings.CACHE_LOCK_TIMEOUT):
+        time.sleep(LOCK_POLL_INTERVAL)
+    try:
+        yield
+    finally:
+        cache.delete(lock_key)
+
+
+def _store(cache, key, value, timeout):
+    if timeout is None:
+        cache.set(key, (value, None), None)
+    else:
+        cache.set(
+            key,
+            (value, time.time() + timeout),
+            timeout + settings.CACHE_STALE_TTL,
+        )
+
+
+def _recompute(cache, key, compute, timeout):
+    try:
+        value = compute()
+        _store(cache, key, value, timeout)
+        return value
+    finally:
+        cache.delete(_lock_key(key))
+
+
+def _lookup(cache, key):
+    entry = cache.get(key)
+    if isinstance(entry, tuple) and len(entry) == 2:
+        return entry
+    return None
+
+
+def get_or_compute(key, compute, timeout, cache=None, refresh=False,
+                   store=True):
+    """Значение из кэша с защитой от «набега» (cache stampede).
+
+    Пересчитывает значение только тот, кто первым взял блокировку
+    в общем кэше. Остальные при устаревшем значении сразу получают
+    его (stale-while-revalidate, не дольше CACHE_STALE_TTL), а при
+    промахе ждут результат не дольше CACHE_LOCK_TIMEOUT.
+
+    refresh -- пересчитать и сохранить, не глядя в кэш; store=False --
+    не сохранять пересчитанное значение.
+    """
+    cache = cache or default_cache
+    key = f'swr:{key}'
+    if refresh or not store:
+        entry = None if refresh else _lookup(cache, key)
+        if entry is not None:
+            return entry[0]
+        value = compute()
+        if store:
+            _store(cache, key, value, timeout)
+        return value
+    lock_key = _lock_key(key)
+    entry = _lookup(cache, key)
+    if entry is not None:
+        value, fresh_until = entry
+        if fresh_until is None or time.time() < fresh_until:
+            return value
+        if not cache.add(lock_key, 1, settings.CACHE_LOCK_TIMEOUT):
+            return value
+        return _recompute(cache, key, compute, timeout)
+    deadline = time.time() + settings.CACHE_LOCK_TIMEOUT
+    while not cache.add(lock_key, 1, settings.CACHE_LOCK_TIMEOUT):
+        if time.time() >= deadline:
+            return compute()
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = _lookup(cache, key)
+        if entry is not None:
+            return entry[0]
+    return _recompute(cache, key, compute, timeout)
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core import checks
+
+LONG_LIVED = (
+    'POSTS_FRAGMENT_CACHE_TIMEOUT', 'POSTS_ANONYMOUS_PAGE_CACHE_TIMEOUT'
+)
+
+
+@checks.register('caches')
+def check_shared_cache(app_configs, **kwargs):
+    """Долгий кэш и отложенная запись опираются на кэш, общий для всех
+    воркеров: иначе сдвиг поколения виден только одному процессу."""
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in settings.PROCESS_LOCAL_CACHE_BACKENDS:
+        return []
+    errors = [
+        checks.Error(
+            f'{name} = {getattr(settings, name)} с кэшем {backend}',
+            hint=(
+                'Задайте общий бэкенд (CACHE_BACKEND) или срок не больше '
+                f'{settings.PROCESS_LOCAL_CACHE_MAX_TIMEOUT} секунд.'
+            ),
+            id='core.E001',
+        )
+        for name in LONG_LIVED
+        if getattr(settings, name) > settings.PROCESS_LOCAL_CACHE_MAX_TIMEOUT
+    ]
+    if settings.POSTS_WRITE_BEHIND:
+        errors.append(checks.Error(
+            f'POSTS_WRITE_BEHIND с кэшем {backend}',
+            hint=(
+                'Незаписанные заявки хранятся в кэше и должны быть видны '
+                'всем воркерам: задайте общий бэкенд (CACHE_BACKEND).'
+            ),
+            id='core.E002',
+        ))
+    return errors
@@ -0,0 +1,223 @@
+import functools
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class RequestStats:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_time = 0.0
+        self.depth = 0
+
+    def as_server_timing(self, total):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;dur={self.cache_time * 1000:.1f};'
+            f'desc="{self.cache_hits} hits / {self.cache_misses} misses"',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+
+def current_stats():
+    return getattr(_local, 'stats', None)
+
+
+class Aggregate:
+    """Суммы замеров по именам представлений между сбросами в лог."""
+
+    FIELDS = (
+        'total', 'queries', 'db_time', 'template_time',
+        'cache_hits', 'cache_misses',
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.views = {}
+        self.since = time.monotonic()
+
+    def add(self, view_name, stats, total):
+        values = {
+            'total': total,
+            'queries': stats.queries,
+            'db_time': stats.db_time,
+            'template_time': stats.template_time,
+            'cache_hits': stats.cache_hits,
+            'cache_misses': stats.cache_misses,
+        }
+        with self.lock:
+            row = self.views.setdefault(
+                view_name, {'count': 0, 'max_total': 0.0,
+                            **dict.fromkeys(self.FIELDS, 0)}
+            )
+            row['count'] += 1
+            row['max_total'] = max(row['max_total'], total)
+            for field, value in values.items():
+                row[field] += value
+
+    def snapshot(self):
+        """Сводка с начала текущего периода."""
+        with self.lock:
+            views = {name: dict(row) for name, row in self.views.items()}
+            since = self.since
+        return {
+            'seconds': round(time.monotonic() - since, 1),
+            'views': _summary(views),
+        }
+
+    def flush_if_due(self):
+        """Раз в INSTRUMENTATION_FLUSH_INTERVAL секунд пишет сводку
+        в лог и начинает копить заново."""
+        with self.lock:
+            if (
+                time.monotonic() - self.since
+                < settings.INSTRUMENTATION_FLUSH_INTERVAL
+            ):
+                return
+            views = self.views
+            self.reset()
+        for name, row in _summary(views).items():
+            logger.info('%s %s', name, row)
+
+
+def _summary(views):
+    """Средние значения по представлениям, время -- в миллисекундах,
+    самые затратные по суммарному времени -- первыми."""
+    report = {}
+    ranked = sorted(views.items(), key=lambda item: -item[1]['total'])
+    for name, row in ranked:
+        count = row['count']
+        report[name] = {
+            'count': count,
+            'avg_ms': round(row['total'] * 1000 / count, 2),
+            'max_ms': round(row['max_total'] * 1000, 2),
+            'total_ms': round(row['total'] * 1000, 2),
+            'avg_queries': round(row['queries'] / count, 2),
+            'avg_db_ms': round(row['db_time'] * 1000 / count, 2),
+            'avg_template_ms': round(
+                row['template_time'] * 1000 / count, 2
+            ),
+            'cache_hits': row['cache_hits'],
+            'cache_misses': row['cache_misses'],
+        }
+    return report
+
+
+aggregate = Aggregate()
+
+
+def _query_wrapper(execute, sql, params, many, context):
+    stats = current_stats()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - started
+
+
+def _timed_render(render):
+    @functools.wraps(render)
+    def wrapper(self, *args, **kwargs):
+        stats = current_stats()
+        if stats is None:
+            return render(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            stats.template_time += time.perf_counter() - started
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _counted_cache(method, many):
+    # get_many у части бэкендов вызывает get: считаем только внешний вызов
+    @functools.wraps(method)
+    def wrapper(self, key_or_keys, *args, **kwargs):
+        stats = current_stats()
+        if stats is None or stats.depth:
+            return method(self, key_or_keys, *args, **kwargs)
+        stats.depth += 1
+        started = time.perf_counter()
+        try:
+            result = method(self, key_or_keys, *args, **kwargs)
+        finally:
+            stats.depth -= 1
+            stats.cache_time += time.perf_counter() - started
+        if many:
+            stats.cache_hits += len(result)
+            stats.cache_misses += len(key_or_keys) - len(result)
+        elif result is None:
+            stats.cache_misses += 1
+        else:
+            stats.cache_hits += 1
+        return result
+    wrapper.instrumented = True
+    return wrapper
+
+
+def install():
+    """Оборачивает рендеринг шаблонов и чтение кэшей. Вызывается один
+    раз из CoreConfig.ready()."""
+    if not getattr(Template.render, 'instrumented', False):
+        Template.render = _timed_render(Template.render)
+    for options in settings.CACHES.values():
+        backend = import_string(options['BACKEND'])
+        if not getattr(backend.get, 'instrumented', False):
+            backend.get = _counted_cache(backend.get, many=False)
+            backend.get_many = _counted_cache(backend.get_many, many=True)
+
+
+class InstrumentationMiddleware:
+    """Считает для каждого запроса обращения к базе, рендеринг шаблонов,
+    попадания в кэш и общее время. Отдаёт их в заголовке Server-Timing
+    и копит сводку по именам представлений."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.INSTRUMENTATION_ENABLED:
+            return self.get_response(request)
+        stats = _local.stats = RequestStats()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(_query_wrapper)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.stats = None
+        total = time.perf_counter() - stats.started
+        match = request.resolver_match
+        aggregate.add(match.view_name if match else '<unresolved>',
+                      stats, total)
+        aggregate.flush_if_due()
+        if settings.INSTRUMENTATION_SERVER_TIMING:
+            response['Server-Timing'] = stats.as_server_timing(total)
+        return response
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.sqlite import measure_concurrency
+
+# Соединение Django без настройки: журнал по умолчанию и ожидание
+# блокировки 5 секунд (timeout модуля sqlite3)
+BASELINE_PRAGMAS = {'busy_timeout': 5000}
+
+
+class Command(BaseCommand):
+    help = (
+        'Пропускная способность параллельных читателей и писателей SQLite '
+        'с настройками по умолчанию и с SQLITE_PRAGMAS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=3.0)
+
+    def handle(self, *args, **options):
+        profiles = {
+            'default': BASELINE_PRAGMAS,
+            'tuned': settings.SQLITE_PRAGMAS,
+        }
+        self.stdout.write(
+            f'{"profile":<10}{"reads/s":>12}{"writes/s":>12}{"busy":>8}'
+        )
+        for name, pragmas in profiles.items():
+            result = measure_concurrency(
+                pragmas,
+                readers=options['readers'],
+                writers=options['writers'],
+                seconds=options['seconds'],
+            )
+            self.stdout.write(
+                f'{name:<10}{result["reads_per_s"]:>12}'
+                f'{result["writes_per_s"]:>12}{result["busy"]:>8}'
+            )
@@ -0,0 +1,53 @@
+"""Плагин pytest: бюджеты запросов представлений.
+
+Во всех тестах превышение бюджета, объявленного через
+core.budgets.query_budget, становится ошибкой, а отдельная проверка
+следит, чтобы бюджет был у каждого адреса из QUERY_BUDGET_URLCONFS.
+Перед очисткой базы после теста плагин дожидается фоновых заданий
+posts.thumbnails, чтобы они не писали в очищаемые таблицы, а после неё
+очищает кэш: транзакция теста не фиксируется, и поколения фрагментов
+posts (posts.versions.bump) не сдвигаются.
+Подключается строкой 'core.pytest_plugin' в pytest_plugins.
+"""
+import pytest
+from django.conf import settings
+
+from core.budgets import unbudgeted_views
+
+
+@pytest.fixture(autouse=True)
+def _enforce_query_budgets(settings):
+    settings.QUERY_BUDGET_RAISE = True
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_teardown(item, nextitem):
+    from django.core.cache import cache
+    from posts.thumbnails import wait_for_jobs
+    wait_for_jobs()
+    yield
+    cache.clear()
+
+
+class QueryBudgetsDeclared(pytest.Item):
+
+    def __init__(self, *, urlconf, **kwargs):
+        super().__init__(**kwargs)
+        self.urlconf = urlconf
+
+    def runtest(self):
+        missing = unbudgeted_views(self.urlconf)
+        assert not missing, (
+            f'Представления из {self.urlconf} без @query_budget: '
+            + ', '.join(missing)
+        )
+
+    def reportinfo(self):
+        return self.fspath, None, f'query budgets: {self.urlconf}'
+
+
+def pytest_collection_modifyitems(session, config, items):
+    for urlconf in settings.QUERY_BUDGET_URLCONFS:
+        items.append(QueryBudgetsDeclared.from_parent(
+            session, name=f'query_budgets[{urlconf}]', urlconf=urlconf
+        ))
@@ -0,0 +1,96 @@
+import functools
+import random
+import threading
+import time
+
+from django.conf import settings
+
+PIN_COOKIE = 'pin_primary'
+
+_local = threading.local()
+
+
+class ReplicaRouter:
+    """Чтение моделей из DATABASE_REPLICA_APPS внутри read_from_replicas
+    идёт на случайную реплику из DATABASE_REPLICAS, всё остальное --
+    на основную базу. Сессии и пользователи читаются только с основной,
+    чтобы отставание реплики не разлогинивало."""
+
+    def db_for_read(self, model, **hints):
+        if (
+            getattr(_local, 'replicas', False)
+            and settings.DATABASE_REPLICAS
+            and model._meta.app_label in settings.DATABASE_REPLICA_APPS
+        ):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        _local.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схема попадает на реплики вместе с данными
+        return db not in settings.DATABASE_REPLICAS
+
+
+def read_from_replicas(view):
+    """Читающее представление берёт данные с реплик, если только
+    клиент недавно не писал (см. pin_to_primary)."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        pinned = PIN_COOKIE in request.COOKIES
+        _local.pinned = pinned
+        _local.replicas = not pinned
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _local.pinned = _local.replicas = False
+    return wrapper
+
+
+def pinned():
+    """Клиент недавно писал: общие кэши он должен собирать заново
+    с основной базы, а не получать копию, собранную до записи."""
+    return bool(
+        getattr(_local, 'pinned', False) and settings.DATABASE_REPLICAS
+    )
+
+
+def may_cache(changed_at):
+    """Можно ли положить в общий кэш прочитанное в этом запросе, если
+    данные последний раз менялись в changed_at. Реплика может отставать
+    до REPLICA_PIN_SECONDS после записи, и собранная с неё копия легла
+    бы под уже сдвинутое поколение, поэтому до тех пор кэш пополняют
+    только чтения с основной базы."""
+    if not (getattr(_local, 'replicas', False) and settings.DATABASE_REPLICAS):
+        return True
+    return time.time() - changed_at.timestamp() > settings.REPLICA_PIN_SECONDS
+
+
+def pin_to_primary(view):
+    """Если представление что-то записало, клиент следующие
+    REPLICA_PIN_SECONDS секунд читает с основной базы и видит
+    свои изменения, даже пока реплики отстают."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        _local.wrote = False
+        try:
+            response = view(request, *args, **kwargs)
+            wrote = _local.wrote
+        finally:
+            _local.wrote = False
+        if wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+            )
+        return response
+    return wrapper
@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, comment_count INTEGER)',
+    'CREATE TABLE comment (id INTEGER PRIMARY KEY, post_id INTEGER, '
+    'text TEXT, created REAL)',
+    'CREATE INDEX comment_post_created ON comment (post_id, created DESC)',
+)
+POSTS = 100
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Настраивает каждое новое соединение SQLite по SQLITE_PRAGMAS.
+    Подключается к сигналу connection_created в CoreConfig.ready()."""
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            apply_pragmas(cursor, settings.SQLITE_PRAGMAS)
+
+
+def _connect(path, pragmas):
+    connection = sqlite3.connect(path, timeout=0, isolation_level=None,
+                                 check_same_thread=False)
+    apply_pragmas(connection, pragmas)
+    return connection
+
+
+def _reader(path, pragmas, stop, counts):
+    connection = _connect(path, pragmas)
+    post_id = 0
+    while not stop.is_set():
+        post_id = post_id % POSTS + 1
+        try:
+            connection.execute(
+                'SELECT id, text FROM comment WHERE post_id = ? '
+                'ORDER BY created DESC LIMIT 20', (post_id,)
+            ).fetchall()
+            counts['reads'] += 1
+        except sqlite3.OperationalError:
+            counts['busy'] += 1
+    connection.close()
+
+
+def _writer(path, pragmas, stop, counts):
+    # Как add_comment: комментарий и счётчик поста в одной транзакции
+    connection = _connect(path, pragmas)
+    post_id = 0
+    while not stop.is_set():
+        post_id = post_id % POSTS + 1
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute(
+                'INSERT INTO comment (post_id, text, created) '
+                'VALUES (?, ?, ?)', (post_id, 'комментарий', time.time())
+            )
+            connection.execute(
+                'UPDATE post SET comment_count = comment_count + 1 '
+                'WHERE id = ?', (post_id,)
+            )
+            connection.execute('COMMIT')
+            counts['writes'] += 1
+        except sqlite3.OperationalError:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            counts['busy'] += 1
+    connection.close()
+
+
+def measure_concurrency(pragmas, readers=4, writers=2, seconds=2.0):
+    """Операций в секунду у параллельных читателей и писателей на
+    временном файле базы с заданными PRAGMA. busy -- сколько раз
+    операция упёрлась в блокировку дольше busy_timeout."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.sqlite3')
+        connection = _connect(path, pragmas)
+        for statement in SCHEMA:
+            connection.execute(statement)
+        connection.executemany(
+            'INSERT INTO post (id, comment_count) VALUES (?, 0)',
+            [(i,) for i in range(1, POSTS + 1)],
+        )
+        stop = threading.Event()
+        workers = [
+            (_reader, {'reads': 0, 'busy': 0}) for _ in range(readers)
+        ] + [
+            (_writer, {'writes': 0, 'busy': 0}) for _ in range(writers)
+        ]
+        threads = [
+            threading.Thread(target=target, args=(path, pragmas, stop, counts))
+            for target, counts in workers
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        connection.close()
+    totals = {'reads': 0, 'writes': 0, 'busy': 0}
+    for _, counts in workers:
+        for name, value in counts.items():
+            totals[name] += value
+    return {
+        'reads_per_s': round(totals['reads'] / seconds, 1),
+        'writes_per_s': round(totals['writes'] / seconds, 1),
+        'busy': totals['busy'],
+    }
@@ -0,0 +1,109 @@
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+
+# Порядок предпочтения сжатых копий (см. core.storage)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding с их весами q. Кодировка с q=0
+    клиентом запрещена; '*' задаёт вес для не перечисленных."""
+    weights = {}
+    for token in header.split(','):
+        name, *params = (part.strip() for part in token.split(';'))
+        if not name:
+            continue
+        weight = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.lower()] = weight
+    return weights
+
+
+def choose_encoding(header, available):
+    """Лучшая из доступных сжатых копий: больший вес q, при равных --
+    порядок ENCODINGS. None, если клиент не принимает ни одну."""
+    weights = accepted_encodings(header)
+    best = None
+    for encoding in available:
+        weight = weights.get(encoding, weights.get('*', 0.0))
+        if weight > 0 and (best is None or weight > best[1]):
+            best = encoding, weight
+    return best and best[0]
+
+
+class StaticFilesMiddleware:
+    """Отдаёт собранную collectstatic статику из STATIC_ROOT без
+    разбора адресов и представлений.
+
+    Файлы с хэшем в имени (из манифеста ManifestStaticFilesStorage)
+    кэшируются клиентом навсегда, остальные -- на
+    STATIC_FALLBACK_MAX_AGE секунд. Если клиент принимает br или gzip
+    и рядом лежит сжатая копия, отдаётся она. В режиме DEBUG статику
+    раздаёт runserver, и промежуточный слой ничего не делает.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.hashed_names = None
+
+    def __call__(self, request):
+        if (
+            settings.DEBUG
+            or not settings.STATIC_ROOT
+            or request.method not in ('GET', 'HEAD')
+            or not request.path_info.startswith(settings.STATIC_URL)
+        ):
+            return self.get_response(request)
+        name = request.path_info[len(settings.STATIC_URL):]
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return self.get_response(request)
+        if not os.path.isfile(path):
+            return self.get_response(request)
+        return self.serve(request, name, path)
+
+    def is_hashed(self, name):
+        if self.hashed_names is None:
+            self.hashed_names = frozenset(
+                getattr(staticfiles_storage, 'hashed_files', {}).values()
+            )
+        return name in self.hashed_names
+
+    def serve(self, request, name, path):
+        content_type, _ = mimetypes.guess_type(path)
+        suffixes = {
+            encoding: suffix for encoding, suffix in ENCODINGS
+            if os.path.isfile(path + suffix)
+        }
+        encoding = choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''), suffixes
+        )
+        if encoding:
+            path += suffixes[encoding]
+        response = FileResponse(
+            open(path, 'rb'),
+            content_type=content_type or 'application/octet-stream',
+        )
+        if encoding:
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ('Accept-Encoding',))
+        response['Cache-Control'] = (
+            IMMUTABLE if self.is_hashed(name)
+            else f'public, max-age={settings.STATIC_FALLBACK_MAX_AGE}'
+        )
+        return response
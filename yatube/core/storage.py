@@ -0,0 +1,71 @@
+import gzip
+from io import BytesIO
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Сжатые копии отдаёт core.staticfiles.StaticFilesMiddleware
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+
+
+def _gzip(content):
+    # gzip.compress принимает mtime только с Python 3.8; без него
+    # в заголовок попадает текущее время и файл меняется при каждой сборке
+    buffer = BytesIO()
+    with gzip.GzipFile(
+        fileobj=buffer, mode='wb', compresslevel=9, mtime=0
+    ) as stream:
+        stream.write(content)
+    return buffer.getvalue()
+
+
+def _compress(content):
+    variants = {'.gz': _gzip(content)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content)
+    return variants
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хэшем содержимого в имени и заранее сжатыми копиями
+    (.gz, .br при установленном brotli) для текстовых форматов.
+
+    Файл, которого нет в манифесте, отдаётся по исходному имени,
+    а не роняет страницу.
+    """
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        # Хэшированное имя файла может прийти в нескольких проходах
+        processed = {}
+        for name, hashed_name, result in super().post_process(
+            paths, dry_run, **options
+        ):
+            processed.update(dict.fromkeys([name, hashed_name]))
+            yield name, hashed_name, result
+        if dry_run:
+            return
+        for name in processed:
+            if name and name.endswith(COMPRESSIBLE):
+                self._write_variants(name)
+
+    def _write_variants(self, name):
+        with self.open(name) as original:
+            content = original.read()
+        for suffix, compressed in _compress(content).items():
+            if len(compressed) >= len(content):
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
@@ -0,0 +1,59 @@
+from django import template
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.templatetags.cache import CacheNode
+
+from core.cache import get_or_compute
+
+register = template.Library()
+
+
+class SharedCacheNode(CacheNode):
+    """Как {% cache %}, но фрагмент пересчитывает один запрос,
+    а остальные ждут его или получают устаревшую копию.
+
+    Переменные контекста cache_refresh и cache_store передаются
+    в get_or_compute (см. posts.versions.cache_policy)."""
+
+    def render(self, context):
+        try:
+            expire_time = self.expire_time_var.resolve(context)
+        except template.VariableDoesNotExist:
+            raise template.TemplateSyntaxError(
+                f'"shared_cache" tag got an unknown variable: '
+                f'{self.expire_time_var.var!r}'
+            )
+        if expire_time is not None:
+            expire_time = int(expire_time)
+        try:
+            fragment_cache = caches['template_fragments']
+        except InvalidCacheBackendError:
+            fragment_cache = caches['default']
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        return get_or_compute(
+            make_template_fragment_key(self.fragment_name, vary_on),
+            lambda: self.nodelist.render(context),
+            expire_time,
+            fragment_cache,
+            refresh=context.get('cache_refresh', False),
+            store=context.get('cache_store', True),
+        )
+
+
+@register.tag('shared_cache')
+def do_shared_cache(parser, token):
+    """{% shared_cache expire_time fragment_name [var1 var2 ...] %}"""
+    nodelist = parser.parse(('endshared_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f'{tokens[0]!r} tag requires at least 2 arguments.'
+        )
+    return SharedCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(t) for t in tokens[3:]],
+        None,
+    )
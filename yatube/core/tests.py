@@ -1,4 +1,32 @@
-from django.test import TestCase, Client
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.management import call_command
+from django.template import Context, Template
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import HttpResponse
+from django.test import (
+    SimpleTestCase, TestCase, Client, RequestFactory, override_settings
+)
+
+from posts.models import Post
+
+from .cache import get_or_compute
+from .checks import check_shared_cache
+from .instrumentation import aggregate
+from .routers import (
+    PIN_COOKIE, ReplicaRouter, pin_to_primary, read_from_replicas
+)
+from .sqlite import measure_concurrency
+from .staticfiles import choose_encoding
 
 
 class ViewTestClass(TestCase):
@@ -10,3 +38,261 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertTemplateUsed(response, 'core/404.html')
         self.assertEqual(response.status_code, 404)
+
+
+class SharedCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self, value='fresh', delay=0):
+        def compute():
+            self.calls += 1
+            time.sleep(delay)
+            return value
+        return compute
+
+    def test_concurrent_misses_compute_once(self):
+        """Одновременные промахи пересчитывают значение один раз"""
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(get_or_compute(
+                'key', self.compute(delay=0.2), 60
+            )))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['fresh'] * 5)
+
+    def test_stale_value_is_served_while_revalidating(self):
+        """Пока значение пересчитывается, отдаётся устаревшая копия"""
+        get_or_compute('key', self.compute('old'), 0)
+        cache.add('swr:key:lock', 1)
+        self.assertEqual(get_or_compute('key', self.compute('new'), 0), 'old')
+        cache.delete('swr:key:lock')
+        self.assertEqual(get_or_compute('key', self.compute('new'), 0), 'new')
+        self.assertEqual(self.calls, 2)
+
+    def test_shared_cache_tag(self):
+        """Тег shared_cache кэширует фрагмент по ключу с vary_on"""
+        template = Template(
+            '{% load shared_cache %}'
+            '{% shared_cache 60 fragment version %}{{ text }}'
+            '{% endshared_cache %}'
+        )
+        render = (
+            lambda text, version:
+            template.render(Context({'text': text, 'version': version}))
+        )
+        self.assertEqual(render('первый', 1), 'первый')
+        self.assertEqual(render('второй', 1), 'первый')
+        self.assertEqual(render('второй', 2), 'второй')
+
+    def test_long_timeouts_need_shared_backend(self):
+        """Долгий кэш в памяти одного процесса не проходит проверку"""
+        self.assertEqual(check_shared_cache(None), [])
+        with override_settings(POSTS_FRAGMENT_CACHE_TIMEOUT=60 * 60 * 24):
+            errors = check_shared_cache(None)
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+        with override_settings(
+            POSTS_FRAGMENT_CACHE_TIMEOUT=60 * 60 * 24,
+            CACHES={'default': {
+                'BACKEND': (
+                    'django.core.cache.backends.filebased.FileBasedCache'
+                ),
+                'LOCATION': tempfile.gettempdir(),
+            }},
+        ):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class InstrumentationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        aggregate.reset()
+        self.client = Client()
+
+    def server_timing(self, response):
+        return dict(
+            (part.split(';')[0], part)
+            for part in response['Server-Timing'].split(', ')
+        )
+
+    def test_server_timing_header(self):
+        """Ответ несёт замеры базы, шаблонов, кэша и общего времени"""
+        timing = self.server_timing(self.client.get('/'))
+        self.assertEqual(set(timing), {'db', 'tpl', 'cache', 'total'})
+        self.assertRegex(timing['db'], r'desc="[1-9]\d* queries"')
+        self.assertRegex(timing['cache'], r'[1-9]\d* misses')
+        timing = self.server_timing(self.client.get('/'))
+        self.assertRegex(timing['cache'], r'[1-9]\d* hits')
+
+    @override_settings(INSTRUMENTATION_SERVER_TIMING=False)
+    def test_header_can_be_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get('/'))
+
+    def test_aggregate_by_view_name(self):
+        """Замеры копятся по именам представлений и видны персоналу"""
+        for _ in range(3):
+            self.client.get('/')
+        staff = get_user_model().objects.create_user(
+            username='staff', is_staff=True
+        )
+        self.client.force_login(staff)
+        report = self.client.get('/instrumentation/').json()
+        self.assertEqual(report['views']['posts:index']['count'], 3)
+        self.assertGreater(report['views']['posts:index']['avg_queries'], 0)
+
+    def test_report_is_staff_only(self):
+        response = self.client.get('/instrumentation/')
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(INSTRUMENTATION_FLUSH_INTERVAL=0)
+    def test_aggregate_is_flushed_to_log(self):
+        """Сводка периодически сбрасывается в лог"""
+        with self.assertLogs('core.instrumentation', 'INFO') as logs:
+            self.client.get('/')
+        self.assertIn('posts:index', logs.output[0])
+        self.assertEqual(aggregate.snapshot()['views'], {})
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTests(TestCase):
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def read_db(self, request, model):
+        @read_from_replicas
+        def view(request):
+            return HttpResponse(self.router.db_for_read(model))
+        return view(request).content.decode()
+
+    def test_read_views_use_replicas(self):
+        """Посты читаются с реплик, пользователи -- с основной базы"""
+        request = self.factory.get('/')
+        self.assertIn(self.read_db(request, Post), ['replica1', 'replica2'])
+        self.assertEqual(self.read_db(request, get_user_model()), 'default')
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_writes_pin_client_to_primary(self):
+        """После записи клиент читает с основной базы"""
+        client = Client()
+        client.force_login(get_user_model().objects.create(username='a'))
+        response = client.post('/create/', {'text': 'Новый пост'})
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertNotIn(PIN_COOKIE, client.get('/create/').cookies)
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(self.read_db(request, Post), 'default')
+
+    def test_pin_only_after_write(self):
+        @pin_to_primary
+        def view(request):
+            return HttpResponse()
+        self.assertNotIn(
+            PIN_COOKIE, view(self.factory.get('/')).cookies
+        )
+
+
+class SqliteTuningTests(TestCase):
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connection_is_tuned(self):
+        """Новое соединение получает PRAGMA из SQLITE_PRAGMAS"""
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 20000)
+        self.assertEqual(self.pragma('cache_size'), -64 * 1024)
+
+    def test_concurrency_benchmark(self):
+        result = measure_concurrency(
+            {'journal_mode': 'wal', 'busy_timeout': 1000},
+            readers=2, writers=1, seconds=0.2,
+        )
+        self.assertGreater(result['reads_per_s'], 0)
+        self.assertGreater(result['writes_per_s'], 0)
+
+
+class StaticPipelineTests(SimpleTestCase):
+
+    def setUp(self):
+        source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source)
+        self.addCleanup(shutil.rmtree, self.root)
+        os.makedirs(os.path.join(source, 'css'))
+        with open(os.path.join(source, 'css', 'site.css'), 'w') as css:
+            css.write('body { color: black; }\n' * 50)
+        shutil.copy(
+            os.path.join(settings.BASE_DIR, 'static', 'img', 'logo.png'),
+            source,
+        )
+        overrides = self.settings(
+            STATICFILES_DIRS=[source],
+            STATIC_ROOT=self.root,
+            STATICFILES_STORAGE=(
+                'core.storage.CompressedManifestStaticFilesStorage'
+            ),
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.css = staticfiles_storage.stored_name('css/site.css')
+
+    def test_collectstatic_hashes_and_compresses(self):
+        """collectstatic кладёт файлы с хэшем и сжатые копии"""
+        self.assertRegex(self.css, r'^css/site\.[0-9a-f]{12}\.css$')
+        with open(os.path.join(self.root, self.css + '.gz'), 'rb') as gz:
+            # Время в заголовке обнулено: повторная сборка даёт те же байты
+            self.assertEqual(gz.read(8)[4:], bytes(4))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.root, 'logo.png.gz')
+        ))
+        self.assertEqual(
+            staticfiles_storage.stored_name('missing.js'), 'missing.js'
+        )
+
+    def test_middleware_serves_compressed_immutable_file(self):
+        response = self.client.get(
+            settings.STATIC_URL + self.css, HTTP_ACCEPT_ENCODING='gzip, br'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        content = b''.join(response.streaming_content)
+        self.assertIn(b'color: black', gzip.decompress(content))
+
+    def test_refused_encoding_is_not_served(self):
+        """gzip;q=0 запрещает сжатую копию"""
+        for header in ('gzip;q=0', 'br, gzip; q=0', '*;q=0', 'identity'):
+            with self.subTest(header=header):
+                response = self.client.get(
+                    settings.STATIC_URL + self.css,
+                    HTTP_ACCEPT_ENCODING=header,
+                )
+                self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(choose_encoding('*', ['br', 'gzip']), 'br')
+        self.assertEqual(
+            choose_encoding('br;q=0.5, gzip;q=0.8', ['br', 'gzip']), 'gzip'
+        )
+
+    def test_unhashed_and_missing_files(self):
+        response = self.client.get(settings.STATIC_URL + 'css/site.css')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertNotIn('immutable', response['Cache-Control'])
+        for name in ('missing.css', '../settings.py'):
+            with self.subTest(name=name):
+                response = self.client.get(settings.STATIC_URL + name)
+                self.assertEqual(response.status_code, 404)
@@ -0,0 +1,217 @@
+import random
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+
+from .models import Comment, Follow, Group, Post, User
+from .transfer import refresh_derived_data
+
+DATASET_SIZES = {
+    'users': 500,
+    'groups': 30,
+    'posts': 20000,
+    'comments': 60000,
+    'follows': 5000,
+}
+
+
+def _bulk(model, objs):
+    # Размер пачки подбирает сам Django: в 2.2 явный batch_size не
+    # ограничивается лимитами SQLite на число параметров
+    model.objects.bulk_create(objs)
+
+
+def generate_dataset(sizes=None, seed=0):
+    """Заполняет базу синтетическими данными. При одном и том же seed
+    получаются одни и те же данные, поэтому прогоны сравнимы."""
+    sizes = {**DATASET_SIZES, **(sizes or {})}
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    rnd = random.Random(seed)
+    now = timezone.now()
+
+    _bulk(User, [
+        User(
+            username=f'user{i}',
+            first_name=fake.first_name(),
+            last_name=fake.last_name(),
+        )
+        for i in range(sizes['users'])
+    ])
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    _bulk(Group, [
+        Group(title=fake.sentence(nb_words=3)[:200], slug=f'group-{i}',
+              description=fake.paragraph())
+        for i in range(sizes['groups'])
+    ])
+    group_ids = list(Group.objects.values_list('pk', flat=True))
+    posts = [
+        Post(
+            text=fake.paragraph(nb_sentences=rnd.randint(1, 8)),
+            author_id=rnd.choice(user_ids),
+            group_id=rnd.choice(group_ids) if rnd.random() < 0.7 else None,
+        )
+        for _ in range(sizes['posts'])
+    ]
+    _bulk(Post, posts)
+    # auto_now_add проставил всем постам одно время: разносим даты
+    post_ids = list(Post.objects.order_by('pk').values_list('pk', flat=True))
+    for index, (post, post_id) in enumerate(zip(posts, post_ids)):
+        post.pk = post_id
+        post.pub_date = now - timedelta(minutes=len(posts) - index)
+    Post.objects.bulk_update(posts, ['pub_date'], batch_size=200)
+    _bulk(Comment, [
+        Comment(
+            post_id=rnd.choice(post_ids),
+            author_id=rnd.choice(user_ids),
+            text=fake.sentence(),
+        )
+        for _ in range(sizes['comments'])
+    ])
+    pairs = set()
+    while len(pairs) < min(
+        sizes['follows'], len(user_ids) * (len(user_ids) - 1)
+    ):
+        user_id, author_id = rnd.sample(user_ids, 2)
+        pairs.add((user_id, author_id))
+    _bulk(Follow, [
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id, author_id in sorted(pairs)
+    ])
+    refresh_derived_data(Post)
+    # Данные записаны в обход сигналов, поэтому версии фрагментов
+    # и страниц не сдвинуты: сбрасываем кэш целиком
+    cache.clear()
+    return sizes
+
+
+def benchmark_targets(seed=0):
+    """Страницы из posts/urls.py: имя, клиент и генератор адресов.
+    Изменяющие данные представления вызываются так же, как из браузера."""
+    rnd = random.Random(seed)
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    slugs = list(Group.objects.values_list('slug', flat=True))
+    usernames = list(User.objects.values_list('username', flat=True))
+    follower = User.objects.filter(follower__isnull=False).first()
+    author = Post.objects.order_by('pk').first().author
+
+    guest = Client()
+    reader = Client()
+    reader.force_login(follower)
+    writer = Client()
+    writer.force_login(author)
+    own_post_ids = list(author.posts.values_list('pk', flat=True))
+
+    def url(name, **kwargs):
+        return lambda: ('get', reverse(f'posts:{name}', kwargs=kwargs), None)
+
+    return [
+        ('index', guest, url('index')),
+        ('index_page', guest, lambda: (
+            'get', reverse('posts:index'), {'page': rnd.randint(1, 50)}
+        )),
+        ('group_list', guest, lambda: (
+            'get', reverse('posts:group_list', args=[rnd.choice(slugs)]), None
+        )),
+        ('profile', guest, lambda: (
+            'get', reverse('posts:profile', args=[rnd.choice(usernames)]), None
+        )),
+        ('post_detail', guest, lambda: (
+            'get', reverse('posts:post_detail', args=[rnd.choice(post_ids)]),
+            None,
+        )),
+        ('search', guest, lambda: (
+            'get', reverse('posts:search'),
+            {'q': rnd.choice(['лес', 'город', 'время', 'работа', 'дом'])},
+        )),
+        ('follow_index', reader, url('follow_index')),
+        ('post_create', writer, url('post_create')),
+        ('post_edit', writer, lambda: (
+            'get',
+            reverse('posts:post_edit', args=[rnd.choice(own_post_ids)]),
+            None,
+        )),
+        ('add_comment', reader, lambda: (
+            'post',
+            reverse('posts:add_comment', args=[rnd.choice(post_ids)]),
+            {'text': 'Комментарий из бенчмарка'},
+        )),
+        ('profile_follow', reader, lambda: (
+            'get',
+            reverse('posts:profile_follow', args=[rnd.choice(usernames)]),
+            None,
+        )),
+        ('profile_unfollow', reader, lambda: (
+            'get',
+            reverse('posts:profile_unfollow', args=[rnd.choice(usernames)]),
+            None,
+        )),
+    ]
+
+
+def percentile(values, percent):
+    """Процентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+def _request(client, make_request):
+    method, path, data = make_request()
+    response = getattr(client, method)(path, data or {})
+    if response.status_code >= 400:
+        raise AssertionError(f'{path}: {response.status_code}')
+    return response
+
+
+def measure(client, make_request, requests=50, warmup=5, cold_cache=False):
+    """Задержки (мс), число запросов к базе и пик выделенной памяти (КиБ)
+    для одной страницы. Память меряется отдельным проходом, чтобы
+    tracemalloc не искажал время."""
+    for _ in range(warmup):
+        _request(client, make_request)
+    timings, queries = [], []
+    for _ in range(requests):
+        if cold_cache:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            _request(client, make_request)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+    peaks = []
+    for _ in range(max(1, requests // 5)):
+        if cold_cache:
+            cache.clear()
+        # Перезапуск обнуляет пик (reset_peak есть только с Python 3.9)
+        tracemalloc.start()
+        try:
+            _request(client, make_request)
+            peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+        finally:
+            tracemalloc.stop()
+    return {
+        'requests': requests,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'queries': max(queries),
+        'alloc_peak_kib': round(percentile(peaks, 50), 1),
+    }
+
+
+def run_benchmark(requests=50, warmup=5, cold_cache=False, seed=0,
+                  only=None):
+    return {
+        name: measure(client, make_request, requests, warmup, cold_cache)
+        for name, client, make_request in benchmark_targets(seed)
+        if not only or name in only
+    }
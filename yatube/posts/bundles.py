@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+
+from core.routers import pinned
+
+from .counters import get_stats
+from .models import Comment, Post
+from .paginators import CursorPaginator
+from .versions import cacheable, get_versions
+
+KEY = 'posts:bundle:{}'
+
+
+def _scopes(post_id, author_id):
+    return f'post:{post_id}', f'author:{author_id}'
+
+
+def get_comment_page(post_id, cursor=None):
+    """Страница комментариев поста от новых к старым по ключу
+    (created, id). Следующую страницу отдаёт представление comments."""
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        settings.POSTS_COMMENTS_PER_PAGE,
+        ordering=('-created', '-pk'),
+    )
+    return paginator.get_page(cursor)
+
+
+def build_post_bundle(post_id):
+    """Всё, что нужно странице поста: пост с автором и группой, число
+    постов автора и первая страница комментариев с их авторами."""
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
+    comments = get_comment_page(post.pk)
+    return {
+        'post': post,
+        'posts_count': get_stats(post.author).posts_count,
+        'comments': list(comments),
+        'comments_next_cursor': comments.next_cursor,
+        'versions': get_versions(*_scopes(post.pk, post.author_id)),
+    }
+
+
+def get_post_bundle(post_id):
+    """Пакет страницы поста из кэша. Он устаревает вместе с поколениями
+    поста и автора (posts.versions), которые сдвигают сигналы при правке
+    поста, новом комментарии и новых постах автора."""
+    key = KEY.format(post_id)
+    bundle = None if pinned() else cache.get(key)
+    if bundle is not None and bundle['versions'] == get_versions(
+        *_scopes(post_id, bundle['post'].author_id)
+    ):
+        return bundle
+    bundle = build_post_bundle(post_id)
+    if cacheable(*bundle_scopes(bundle)):
+        cache.set(key, bundle, settings.POSTS_FRAGMENT_CACHE_TIMEOUT)
+    return bundle
+
+
+def bundle_scopes(bundle):
+    """Области, по поколениям которых устаревает пакет и фрагменты
+    страницы поста."""
+    return _scopes(bundle['post'].pk, bundle['post'].author_id)
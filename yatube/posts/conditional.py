@@ -0,0 +1,88 @@
+import hashlib
+
+from django.db.models import Max
+from django.views.decorators.http import condition
+
+from .bundles import get_post_bundle
+from .models import Group, Post, User
+from .versions import changed_at, get_versions
+
+
+def _listing_stamps(posts, *scopes):
+    latest = posts.aggregate(latest=Max('pub_date'))['latest']
+    modified = changed_at(*scopes)
+    if latest is not None:
+        modified = max(modified, latest)
+    return f'{get_versions(*scopes)}:{latest}', modified
+
+
+def index_stamps():
+    return _listing_stamps(Post.objects.all(), 'all')
+
+
+def group_stamps(slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    if group_id is None:
+        return None
+    return _listing_stamps(
+        Post.objects.filter(group_id=group_id), f'group:{group_id}'
+    )
+
+
+def profile_stamps(username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    if author_id is None:
+        return None
+    return _listing_stamps(
+        Post.objects.filter(author_id=author_id),
+        f'author:{author_id}',
+        f'profile:{author_id}',
+    )
+
+
+def post_stamps(post_id):
+    # Пакет страницы и так нужен представлению: горячий пост
+    # проверяется без запросов к базе
+    bundle = get_post_bundle(post_id)
+    post = bundle['post']
+    dates = [
+        post.pub_date,
+        *(comment.created for comment in bundle['comments'][:1]),
+        changed_at(f'post:{post.pk}', f'author:{post.author_id}'),
+    ]
+    return bundle['versions'], max(dates)
+
+
+def conditional_page(get_stamps):
+    """Условный GET для страницы постов: ETag и Last-Modified по
+    отметкам изменений из get_stamps(**kwargs представления), который
+    возвращает пару (версия, время изменения) или None. Совпавший
+    клиент получает 304 без выполнения представления.
+
+    Страница зависит от пользователя, поэтому он входит в ETag,
+    а Last-Modified отдаётся только анонимам.
+    """
+    def stamps(request, **kwargs):
+        if not hasattr(request, '_page_stamps'):
+            request._page_stamps = get_stamps(**kwargs)
+        return request._page_stamps
+
+    def etag(request, **kwargs):
+        page = stamps(request, **kwargs)
+        if page is None:
+            return None
+        version, modified = page
+        raw = f'{version}:{modified.timestamp()}:{request.user.pk}'
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(request, **kwargs):
+        page = stamps(request, **kwargs)
+        if page is None or request.user.is_authenticated:
+            return None
+        return page[1]
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
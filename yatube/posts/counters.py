@@ -0,0 +1,102 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def _shift(name, delta):
+    return Greatest(F(name) + delta, 0)
+
+
+def change_user_stats(user_id, **deltas):
+    """Атомарно сдвигает счётчики пользователя на заданные величины.
+
+    Строка счётчиков создаётся только при увеличении: уменьшение
+    приходит и при каскадном удалении самого пользователя.
+    """
+    changes = {name: _shift(name, delta) for name, delta in deltas.items()}
+    updated = UserStats.objects.filter(user_id=user_id).update(**changes)
+    if not updated and all(delta > 0 for delta in deltas.values()):
+        UserStats.objects.get_or_create(user_id=user_id)
+        UserStats.objects.filter(user_id=user_id).update(**changes)
+
+
+def change_followers(author_ids, delta):
+    """Сдвигает followers_count сразу у нескольких авторов."""
+    if delta > 0:
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=author_id) for author_id in author_ids],
+            ignore_conflicts=True,
+        )
+    UserStats.objects.filter(user_id__in=author_ids).update(
+        followers_count=_shift('followers_count', delta)
+    )
+
+
+def change_comment_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comment_count=_shift('comment_count', delta)
+    )
+
+
+def get_stats(user):
+    """Счётчики пользователя; для нового пользователя -- нулевые."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats(user=user)
+
+
+def _count(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(count=Count('pk')).values('count'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def reconcile_comment_counts():
+    """Пересчитывает comment_count постов, возвращает число исправленных."""
+    actual = _count(Comment.objects.all(), 'post')
+    return Post.objects.exclude(
+        comment_count=actual
+    ).update(comment_count=actual)
+
+
+def reconcile_user_stats():
+    """Пересчитывает счётчики пользователей, возвращает число исправленных."""
+    users = User.objects.annotate(
+        actual_posts=_count(Post.objects.all(), 'author'),
+        actual_followers=_count(Follow.objects.all(), 'author'),
+        actual_following=_count(Follow.objects.all(), 'user'),
+    ).values_list(
+        'pk', 'actual_posts', 'actual_followers', 'actual_following'
+    )
+    stored = {
+        stats.pk: stats for stats in UserStats.objects.all().iterator()
+    }
+    created, updated = [], []
+    for user_id, posts, followers, following in users.iterator():
+        stats = stored.get(user_id)
+        if stats is None:
+            created.append(UserStats(
+                user_id=user_id,
+                posts_count=posts,
+                followers_count=followers,
+                following_count=following,
+            ))
+        elif (
+            stats.posts_count,
+            stats.followers_count,
+            stats.following_count,
+        ) != (posts, followers, following):
+            stats.posts_count = posts
+            stats.followers_count = followers
+            stats.following_count = following
+            updated.append(stats)
+    UserStats.objects.bulk_create(created, ignore_conflicts=True)
+    UserStats.objects.bulk_update(
+        updated, ['posts_count', 'followers_count', 'following_count']
+    )
+    return len(created) + len(updated)
@@ -0,0 +1,75 @@
+from django.db import connection
+
+from .models import FeedItem, Follow, Post
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам всех подписчиков автора."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    FeedItem.objects.bulk_create(
+        [
+            FeedItem(
+                user_id=user_id,
+                post=post,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers.iterator()
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def backfill_authors(user_id, author_ids):
+    """Добавляет в ленту подписчика уже опубликованные посты авторов."""
+    posts = Post.objects.filter(
+        author_id__in=author_ids
+    ).values_list('pk', 'author_id', 'pub_date')
+    FeedItem.objects.bulk_create(
+        [
+            FeedItem(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, author_id, pub_date in posts.iterator()
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def trim_authors(user_id, author_ids):
+    """Убирает из ленты подписчика посты авторов после отписки."""
+    FeedItem.objects.filter(
+        user_id=user_id, author_id__in=author_ids
+    ).delete()
+
+
+def backfill_feed(follow):
+    backfill_authors(follow.user_id, [follow.author_id])
+
+
+def trim_feed(follow):
+    trim_authors(follow.user_id, [follow.author_id])
+
+
+def rebuild_feeds():
+    """Дополняет ленты всех подписчиков недостающими постами их авторов
+    одним INSERT ... SELECT по подпискам и постам. Возвращает число
+    добавленных записей."""
+    quote = connection.ops.quote_name
+    feed, follow, post = (
+        quote(model._meta.db_table) for model in (FeedItem, Follow, Post)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {feed} (user_id, post_id, author_id, pub_date) '
+            f'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+            f'FROM {follow} f JOIN {post} p ON p.author_id = f.author_id '
+            f'WHERE NOT EXISTS (SELECT 1 FROM {feed} i '
+            f'WHERE i.user_id = f.user_id AND i.post_id = p.id)'
+        )
+        return cursor.rowcount
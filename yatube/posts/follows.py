@@ -0,0 +1,90 @@
+from django.db import connection
+
+from .counters import change_followers, change_user_stats
+from .feed import backfill_authors, trim_authors
+from .models import Follow
+from .versions import bump
+
+
+def _returning_supported():
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35)
+    return connection.vendor == 'postgresql'
+
+
+def _author_ids(user, authors):
+    """SQL подзапроса с id авторов без самого пользователя."""
+    return authors.exclude(pk=user.pk).values('pk').query.sql_with_params()
+
+
+def _run(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _changed(user, author_ids, delta):
+    """То, что при записи через ORM делают сигналы Follow: счётчики,
+    лента подписчика и версии профилей."""
+    if not author_ids:
+        return
+    change_user_stats(user.pk, following_count=delta * len(author_ids))
+    change_followers(author_ids, delta)
+    if delta > 0:
+        backfill_authors(user.pk, author_ids)
+    else:
+        trim_authors(user.pk, author_ids)
+    bump(
+        f'profile:{user.pk}',
+        *(f'profile:{author_id}' for author_id in author_ids),
+    )
+
+
+def follow_authors(user, authors):
+    """Подписывает пользователя на авторов из выборки User одним
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING: уже существующие
+    подписки и повторные клики не дают ни ошибки, ни дубля.
+    Возвращает id авторов, подписка на которых появилась сейчас."""
+    if not _returning_supported():
+        # Вставка через ORM: get_or_create отличает свою запись от записи
+        # параллельного клика, а производные данные поправят сигналы
+        existing = Follow.objects.filter(user=user).values('author_id')
+        candidates = authors.exclude(pk=user.pk).exclude(pk__in=existing)
+        return [
+            author_id
+            for author_id in candidates.values_list('pk', flat=True)
+            if Follow.objects.get_or_create(user=user, author_id=author_id)[1]
+        ]
+    subquery, params = _author_ids(user, authors)
+    quote = connection.ops.quote_name
+    author_ids = _run(
+        f'INSERT INTO {quote(Follow._meta.db_table)} '
+        f'({quote("user_id")}, {quote("author_id")}) '
+        f'SELECT %s, authors.* FROM ({subquery}) AS authors WHERE 1 = 1 '
+        f'ON CONFLICT DO NOTHING RETURNING {quote("author_id")}',
+        (user.pk, *params),
+    )
+    _changed(user, author_ids, 1)
+    return author_ids
+
+
+def unfollow_authors(user, authors):
+    """Отписывает пользователя от авторов из выборки одним DELETE.
+    Возвращает id авторов, подписка на которых была удалена."""
+    if not _returning_supported():
+        # Удаление через ORM: производные данные поправят сигналы
+        follows = Follow.objects.filter(user=user, author__in=authors)
+        author_ids = list(follows.values_list('author_id', flat=True))
+        follows.delete()
+        return author_ids
+    subquery, params = _author_ids(user, authors)
+    quote = connection.ops.quote_name
+    author_ids = _run(
+        f'DELETE FROM {quote(Follow._meta.db_table)} '
+        f'WHERE {quote("user_id")} = %s '
+        f'AND {quote("author_id")} IN ({subquery}) '
+        f'RETURNING {quote("author_id")}',
+        (user.pk, *params),
+    )
+    _changed(user, author_ids, -1)
+    return author_ids
@@ -0,0 +1,105 @@
+import json
+import platform
+import subprocess
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.runner import DiscoverRunner
+from django.test.utils import (
+    override_settings, setup_test_environment, teardown_test_environment,
+)
+
+from posts.benchmark import DATASET_SIZES, generate_dataset, run_benchmark
+
+COLUMNS = ('p50_ms', 'p95_ms', 'p99_ms', 'queries', 'alloc_peak_kib')
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон страниц posts на синтетических данных '
+        'во временной базе: задержки p50/p95/p99, запросы и память'
+    )
+
+    def add_arguments(self, parser):
+        for name, size in DATASET_SIZES.items():
+            parser.add_argument(f'--{name}', type=int, default=size)
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--cold-cache', action='store_true',
+            help='Очищать кэш перед каждым запросом',
+        )
+        parser.add_argument(
+            '--only', nargs='+', help='Имена страниц для прогона'
+        )
+        parser.add_argument('-o', '--output', help='Сохранить отчёт в JSON')
+        parser.add_argument(
+            '--compare', help='JSON прошлого прогона для сравнения'
+        )
+
+    def handle(self, *args, **options):
+        sizes = {name: options[name] for name in DATASET_SIZES}
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0)
+        old_config = runner.setup_databases()
+        try:
+            # Тот же режим, что и в бою: без отладочных накоплений
+            with override_settings(DEBUG=False):
+                generate_dataset(sizes, options['seed'])
+                results = run_benchmark(
+                    options['requests'], options['warmup'],
+                    options['cold_cache'], options['seed'], options['only'],
+                )
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+        report = {
+            'meta': {
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': settings.DATABASES['default']['ENGINE'],
+                'cache': settings.CACHES['default']['BACKEND'],
+                'dataset': sizes,
+                'seed': options['seed'],
+                'requests': options['requests'],
+                'cold_cache': options['cold_cache'],
+                'keyset_pagination': settings.POSTS_KEYSET_PAGINATION,
+            },
+            'results': results,
+        }
+        baseline = {}
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as stream:
+                baseline = json.load(stream)['results']
+        self.print_table(results, baseline)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(report, stream, ensure_ascii=False, indent=2)
+
+    def print_table(self, results, baseline):
+        self.stdout.write(
+            f'{"page":<18}' + ''.join(f'{column:>22}' for column in COLUMNS)
+        )
+        for name, row in results.items():
+            cells = []
+            for column in COLUMNS:
+                cell = f'{row[column]}'
+                if name in baseline:
+                    before = baseline[name][column]
+                    if before:
+                        cell += f' ({(row[column] - before) / before:+.0%})'
+                cells.append(f'{cell:>22}')
+            self.stdout.write(f'{name:<18}' + ''.join(cells))
@@ -0,0 +1,56 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts.transfer import (
+    FORMATS, MODELS, export_rows, prepare_resume, transfer_fields,
+    write_rows,
+)
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает данные posts в JSONL или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=MODELS)
+        parser.add_argument(
+            '-o', '--output', default='-',
+            help='Файл выгрузки, по умолчанию -- stdout',
+        )
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument(
+            '--after', type=int,
+            help='Выгружать только строки с pk больше заданного',
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Дописать файл, продолжив с его последней строки',
+        )
+
+    def handle(self, *args, **options):
+        model = MODELS[options['model']]
+        file_format = options['format']
+        path = options['output']
+        after = options['after']
+        header = True
+        if options['resume'] and os.path.exists(path):
+            after = prepare_resume(path, file_format) or after
+            header = os.path.getsize(path) == 0
+        chunk_size = options['chunk_size']
+        rows = export_rows(model, after, chunk_size)
+        names = [field.attname for field in transfer_fields(model)]
+        if path == '-':
+            count = write_rows(
+                rows, sys.stdout, names, file_format, header, chunk_size
+            )
+        else:
+            mode = 'a' if options['resume'] else 'w'
+            with open(path, mode, newline='', encoding='utf-8') as stream:
+                count = write_rows(
+                    rows, stream, names, file_format, header, chunk_size
+                )
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено строк: {count}'
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.writebehind import flush, recover
+
+
+class Command(BaseCommand):
+    help = (
+        'Подхватывает журналы отложенной записи остановленных процессов '
+        'и записывает накопленные комментарии и подписки'
+    )
+
+    def handle(self, *args, **options):
+        recovered = recover()
+        written = flush()
+        self.stdout.write(self.style.SUCCESS(
+            f'Подхвачено из журналов: {recovered}, записано: {written}'
+        ))
@@ -0,0 +1,48 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts.transfer import (
+    FORMATS, MODELS, import_rows, read_rows, refresh_derived_data,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково загружает данные posts из JSONL или CSV пачками '
+        'bulk_create; повторный запуск пропускает загруженные строки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=MODELS)
+        parser.add_argument(
+            '-i', '--input', default='-',
+            help='Файл для загрузки, по умолчанию -- stdin',
+        )
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--skip-refresh', action='store_true',
+            help='Не пересчитывать счётчики, ленты и поисковый индекс',
+        )
+
+    def handle(self, *args, **options):
+        model = MODELS[options['model']]
+        file_format = options['format']
+        path = options['input']
+        if path == '-':
+            count = import_rows(
+                model, read_rows(sys.stdin, file_format),
+                options['batch_size'],
+            )
+        else:
+            with open(path, newline='', encoding='utf-8') as stream:
+                count = import_rows(
+                    model, read_rows(stream, file_format),
+                    options['batch_size'],
+                )
+        if not options['skip_refresh']:
+            refresh_derived_data(model)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {count}'
+        ))
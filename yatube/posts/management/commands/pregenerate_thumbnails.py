@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import pregenerate_all
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит заранее миниатюры и адаптивные варианты '
+        'для всех изображений постов'
+    )
+
+    def handle(self, *args, **options):
+        count = pregenerate_all(
+            Post.objects.exclude(image='').only(
+                'image', 'author', 'group'
+            ).iterator()
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Изображения подготовлены для постов: {count}'
+        ))
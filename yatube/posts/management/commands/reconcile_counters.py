@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import reconcile_comment_counts, reconcile_user_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счётчики постов, комментариев '
+        'и подписок и исправляет расхождения'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            posts_fixed = reconcile_comment_counts()
+            users_fixed = reconcile_user_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счётчиков: постов -- {posts_fixed}, '
+            f'пользователей -- {users_fixed}'
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_index_tiebreak'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='writebehind_id',
+            field=models.CharField(editable=False, max_length=32, null=True, unique=True),
+        ),
+    ]
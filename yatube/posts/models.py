@@ -1,5 +1,8 @@
+import json
+
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
 
 User = get_user_model()
 
@@ -14,6 +17,18 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+
+    def for_listing(self):
+        """Посты для лент: автор и группа подтягиваются тем же запросом."""
+        return self.select_related('author', 'group').only(
+            'text', 'pub_date', 'image', 'image_variants', 'comment_count',
+            'author', 'group',
+            'author__username', 'author__first_name', 'author__last_name',
+            'group__title', 'group__slug',
+        )
+
+
 class Post(models.Model):
     """Модель поста"""
     text = models.TextField(
@@ -45,15 +60,59 @@ class Post(models.Model):
         verbose_name='Изображение',
         help_text='Добавьте изображение к посту'
     )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число комментариев',
+    )
+    image_variants = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='Варианты изображения',
+        help_text='JSON-список уменьшенных копий изображения'
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def image_sources(self):
+        """Источники <picture>: тип файла и srcset из вариантов."""
+        try:
+            variants = json.loads(self.image_variants or '[]')
+        except ValueError:
+            variants = []
+        sources = {}
+        for variant in variants:
+            url = default_storage.url(variant['name'])
+            sources.setdefault(variant['type'], []).append(
+                f'{url} {variant["width"]}w'
+            )
+        return [
+            {'type': mime, 'srcset': ', '.join(srcset)}
+            for mime, srcset in sources.items()
+        ]
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -74,12 +133,23 @@ class Comment(models.Model):
         verbose_name="Дата добавления комментария",
         auto_now_add=True
     )
+    # Заявка отложенной записи (posts.writebehind): по ней повторно
+    # записываемая после сбоя пачка пропускает уже сохранённое
+    writebehind_id = models.CharField(
+        max_length=32, unique=True, null=True, editable=False
+    )
 
     def __str__(self):
         return self.text
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx',
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -100,3 +170,56 @@ class Follow(models.Model):
                 fields=['user', 'author'], name='unique_author_user_following'
             )
         ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые поддерживаются при записи"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return str(self.user)
+
+
+class FeedItem(models.Model):
+    """Запись материализованной ленты подписок пользователя"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_items'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_feed_user_post'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'], name='feed_user_author_idx'
+            ),
+        ]
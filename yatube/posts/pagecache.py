@@ -0,0 +1,100 @@
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import parse_http_date_safe
+
+from core.routers import pinned
+
+from .versions import cacheable, get_versions
+
+KEY = 'posts:page:{}'
+# Параметры, от которых зависит страница; запросы с любыми другими
+# не кэшируются, чтобы мусорная строка запроса не вытесняла горячие
+# страницы и не обходила кэш
+CACHED_PARAMS = ('page', 'cursor')
+
+
+def _cacheable(request):
+    # Без сессионной куки пользователь заведомо аноним, и проверить
+    # это можно без обращения к базе
+    return (
+        settings.POSTS_ANONYMOUS_PAGE_CACHE_TIMEOUT
+        and request.method in ('GET', 'HEAD')
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and all(
+            name in CACHED_PARAMS and len(values) == 1
+            for name, values in request.GET.lists()
+        )
+    )
+
+
+def _key(request):
+    params = '&'.join(
+        f'{name}={request.GET[name]}'
+        for name in CACHED_PARAMS if name in request.GET
+    )
+    return KEY.format(
+        hashlib.md5(f'{request.path}?{params}'.encode()).hexdigest()
+    )
+
+
+def page_depends_on(request, *scopes):
+    """Добавляет области (posts.versions), со сдвигом которых
+    закэшированная для анонимов страница устаревает. Поколения
+    запоминаются до рендеринга, чтобы не сохранить старую страницу
+    под новой версией."""
+    versions = getattr(request, '_page_versions', None)
+    if versions is not None:
+        for scope in scopes:
+            versions.setdefault(scope, get_versions(scope))
+
+
+def _not_modified(request, response):
+    return get_conditional_response(
+        request,
+        etag=response.get('ETag'),
+        last_modified=parse_http_date_safe(response.get('Last-Modified')),
+        response=response,
+    )
+
+
+def anonymous_page_cache(view):
+    """Кэширует ответ целиком для анонимов по пути и номеру страницы
+    (CACHED_PARAMS).
+
+    Любая запись в posts сдвигает поколение 'all' (см. posts.signals),
+    остальные области представление объявляет через page_depends_on.
+    Горячая страница отдаётся без запросов к базе, с учётом
+    If-None-Match и If-Modified-Since. Клиенту, закреплённому за
+    основной базой, страница собирается заново, а собранная с отстающей
+    реплики не сохраняется (core.routers.may_cache).
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _cacheable(request):
+            return view(request, *args, **kwargs)
+        key = _key(request)
+        entry = None if pinned() else cache.get(key)
+        if entry is not None and entry['versions'] == get_versions(
+            *entry['scopes']
+        ):
+            return _not_modified(request, entry['response'])
+        request._page_versions = {}
+        page_depends_on(request, 'all')
+        response = view(request, *args, **kwargs)
+        patch_vary_headers(response, ('Cookie',))
+        versions = request._page_versions
+        if (
+            response.status_code == 200 and not response.streaming
+            and cacheable(*versions)
+        ):
+            cache.set(key, {
+                'scopes': list(versions),
+                'versions': '.'.join(versions.values()),
+                'response': response,
+            }, settings.POSTS_ANONYMOUS_PAGE_CACHE_TIMEOUT)
+        return response
+    return wrapper
@@ -0,0 +1,167 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(values, backwards=False):
+    """Упаковывает значения ключа сортировки в непрозрачный токен."""
+    payload = {
+        'v': [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in values
+        ],
+        'b': backwards,
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    padding = '=' * (-len(cursor) % 4)
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        return list(payload['v']), bool(payload['b'])
+    except (binascii.Error, ValueError, TypeError, KeyError) as error:
+        raise InvalidCursor(cursor) from error
+
+
+class ListingPaginator(Paginator):
+    """Нумерованный паджинатор, который считает записи без JOIN-ов
+    и аннотаций выборки (см. PostQuerySet.for_listing)."""
+
+    @cached_property
+    def count(self):
+        return self.object_list.values('pk').count()
+
+
+class CursorPage(Page):
+    """Страница keyset-паджинатора: знает только соседние курсоры."""
+
+    def __init__(self, object_list, paginator, cursor,
+                 next_cursor, previous_cursor):
+        super().__init__(object_list, None, paginator)
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage {self.cursor or "first"}>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """Паджинатор по ключу (seek), без COUNT(*) и OFFSET.
+
+    ordering -- поля сортировки, последнее из которых должно быть
+    уникальным (по умолчанию (pub_date, id) по убыванию). Значение ключа
+    берётся из атрибута объекта с именем последней части пути:
+    для feed_items__pub_date это post.pub_date, а ссылка на сам объект
+    (feed_items__post) даёт post.pk. Так ключ целиком читается
+    из индекса связанной таблицы, и сортировать выборку не нужно.
+
+    where -- условие отбора по многозначной связи: оно накладывается
+    тем же filter(), что и условие курсора, чтобы не плодить JOIN.
+    """
+    cursor_based = True
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-pk'), where=None):
+        super().__init__(object_list, per_page)
+        self.where = where or Q()
+        self.ordering = [
+            (field.lstrip('-'), field.startswith('-')) for field in ordering
+        ]
+
+    def _order_by(self, backwards):
+        # F() сортирует по самому столбцу: строка 'feed_items__post'
+        # развернулась бы в Meta.ordering поста с лишним JOIN
+        return [
+            F(name).desc() if descending != backwards else F(name).asc()
+            for name, descending in self.ordering
+        ]
+
+    def _seek(self, values, backwards):
+        condition = Q()
+        equal = {}
+        for (name, descending), value in zip(self.ordering, values):
+            lookup = 'lt' if descending != backwards else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        # Без общей границы по первому полю SQLite разбивает OR на
+        # несколько обходов индекса (MULTI-INDEX OR) и сортирует всё,
+        # что лежит за курсором; с ней -- один диапазон индекса
+        (name, descending), value = self.ordering[0], values[0]
+        bound = 'lte' if descending != backwards else 'gte'
+        return Q(**{f'{name}__{bound}': value}) & condition
+
+    @staticmethod
+    def _value(obj, name):
+        attr = name.rsplit('__', 1)[-1]
+        if attr == obj._meta.model_name:
+            return obj.pk
+        return getattr(obj, attr)
+
+    def _cursor_for(self, obj, backwards):
+        return encode_cursor(
+            [self._value(obj, name) for name, _ in self.ordering],
+            backwards,
+        )
+
+    def get_page(self, cursor=None):
+        values, backwards = None, False
+        if cursor:
+            try:
+                values, backwards = decode_cursor(cursor)
+            except InvalidCursor:
+                cursor = None
+        queryset = self.object_list.order_by(*self._order_by(backwards))
+        condition = self.where
+        if values is not None:
+            condition &= self._seek(values, backwards)
+        try:
+            queryset = queryset.filter(condition)
+        except (ValidationError, ValueError, TypeError):
+            return self.get_page()
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+        more_after = has_more if not backwards else values is not None
+        more_before = has_more if backwards else values is not None
+        next_cursor = previous_cursor = None
+        if rows and more_after:
+            next_cursor = self._cursor_for(rows[-1], backwards=False)
+        if rows and more_before:
+            previous_cursor = self._cursor_for(rows[0], backwards=True)
+        return CursorPage(
+            rows, self, cursor, next_cursor, previous_cursor
+        )
+
+
+def paginate(request, post_list, ordering=('-pub_date', '-pk'), where=None):
+    """Возвращает страницу постов в режиме, заданном в настройках."""
+    if settings.POSTS_KEYSET_PAGINATION:
+        paginator = CursorPaginator(
+            post_list, settings.POSTS_PER_PAGE, ordering, where
+        )
+        return paginator.get_page(request.GET.get('cursor'))
+    if where is not None:
+        post_list = post_list.filter(where)
+    paginator = ListingPaginator(post_list, settings.POSTS_PER_PAGE)
+    return paginator.get_page(request.GET.get('page'))
@@ -0,0 +1,86 @@
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+WORD = re.compile(r'\w+')
+NO_RANK = Value(0.0, output_field=FloatField())
+
+
+def fts_available():
+    """Полнотекстовый индекс есть только у SQLite (FTS5)."""
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """Переводит строку поиска в запрос FTS5: каждое слово ищется
+    как префикс, все слова обязательны. Спецсимволы FTS5 отбрасываются."""
+    return ' '.join(f'"{word}"*' for word in WORD.findall(query.lower()))
+
+
+def index_post(post):
+    """Записывает текст поста в индекс (вставка или замена)."""
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, text) '
+            'VALUES (%s, %s)',
+            [post.pk, post.text],
+        )
+
+
+def unindex_post(post_id):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild_index():
+    """Заполняет индекс заново по таблице постов. Нужен после
+    bulk_create и загрузки данных в обход сигналов."""
+    if not fts_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) '
+            'SELECT id, text FROM posts_post'
+        )
+        return cursor.rowcount
+
+
+def search_posts(query, queryset=None):
+    """Посты, подходящие под запрос, с оценкой search_rank (bm25:
+    чем меньше, тем выше в выдаче). Пустой запрос ничего не находит."""
+    if queryset is None:
+        queryset = Post.objects.all()
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none().annotate(search_rank=NO_RANK)
+    if not fts_available():
+        words = WORD.findall(query)
+        for word in words:
+            queryset = queryset.filter(text__icontains=word)
+        return queryset.annotate(search_rank=NO_RANK)
+    # RawSQL в pk__in оборачивается в лишние скобки и превращается
+    # в скалярный подзапрос, поэтому условие задаётся через extra()
+    return queryset.extra(
+        where=[
+            f'posts_post.id IN (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s)'
+        ],
+        params=[expression],
+    ).annotate(
+        search_rank=RawSQL(
+            f'SELECT rank FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = posts_post.id',
+            [expression],
+            output_field=FloatField(),
+        )
+    )
@@ -0,0 +1,138 @@
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from .counters import change_comment_count, change_user_stats
+from .feed import backfill_feed, fan_out_post, trim_feed
+from .models import Comment, Follow, Group, Post, User
+from .search import index_post, unindex_post
+from .versions import bump, bump_post
+
+NAME_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, **kwargs):
+    instance._previous_group_id = instance.pk and Post.objects.filter(
+        pk=instance.pk
+    ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        change_user_stats(instance.author_id, posts_count=1)
+        fan_out_post(instance)
+    index_post(instance)
+    bump_post(
+        instance.pk,
+        instance.author_id,
+        instance.group_id,
+        getattr(instance, '_previous_group_id', None),
+    )
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    change_user_stats(instance.author_id, posts_count=-1)
+    unindex_post(instance.pk)
+    bump_post(instance.pk, instance.author_id, instance.group_id)
+
+
+def comment_changed(comment, delta):
+    change_comment_count(comment.post_id, delta)
+    post = Post.objects.filter(pk=comment.post_id).values_list(
+        'author_id', 'group_id'
+    ).first()
+    if post is not None:
+        bump_post(comment.post_id, *post)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        comment_changed(instance, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    comment_changed(instance, -1)
+
+
+def bump_group_posts(group):
+    # Название группы выводится в карточках и на странице каждого поста
+    posts = list(group.posts.values_list('pk', 'author_id'))
+    bump(
+        'all',
+        f'group:{group.pk}',
+        *(f'post:{post_id}' for post_id, _ in posts),
+        *{f'author:{author_id}' for _, author_id in posts},
+    )
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    if created:
+        bump('all', f'group:{instance.pk}')
+    else:
+        bump_group_posts(instance)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    bump_group_posts(instance)
+
+
+@receiver(pre_save, sender=User)
+def user_changing(sender, instance, update_fields=None, **kwargs):
+    # Вход пользователя сохраняет только last_login: без лишнего запроса
+    if not instance.pk or (
+        update_fields is not None and not set(update_fields) & NAME_FIELDS
+    ):
+        instance._previous_names = None
+        return
+    instance._previous_names = User.objects.filter(
+        pk=instance.pk
+    ).values(*NAME_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_names', None)
+    if created or previous is None or all(
+        previous[name] == getattr(instance, name) for name in NAME_FIELDS
+    ):
+        return
+    # Имя автора есть в карточках его постов во всех лентах,
+    # а имя комментатора -- в комментариях
+    group_ids = instance.posts.exclude(group=None).values_list(
+        'group_id', flat=True
+    ).distinct()
+    post_ids = Comment.objects.filter(author=instance).values_list(
+        'post_id', flat=True
+    ).distinct()
+    bump(
+        'all',
+        f'author:{instance.pk}',
+        f'profile:{instance.pk}',
+        *(f'group:{group_id}' for group_id in group_ids),
+        *(f'post:{post_id}' for post_id in post_ids),
+    )
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        change_user_stats(instance.author_id, followers_count=1)
+        change_user_stats(instance.user_id, following_count=1)
+        backfill_feed(instance)
+        bump(f'profile:{instance.author_id}', f'profile:{instance.user_id}')
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    change_user_stats(instance.author_id, followers_count=-1)
+    change_user_stats(instance.user_id, following_count=-1)
+    trim_feed(instance)
+    bump(f'profile:{instance.author_id}', f'profile:{instance.user_id}')
@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.test import TestCase
+
+from ..benchmark import generate_dataset, percentile, run_benchmark
+from ..models import Comment, Follow, Post
+
+SIZES = {
+    'users': 10, 'groups': 3, 'posts': 30, 'comments': 40, 'follows': 15,
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+class BenchmarkTests(TestCase):
+    def generate(self, seed):
+        generate_dataset(SIZES, seed)
+        return list(Post.objects.order_by('pk').values_list(
+            'text', 'author__username', 'group__slug'
+        ))
+
+    def test_dataset_is_reproducible(self):
+        """Набор данных задаётся размерами и seed"""
+        try:
+            with transaction.atomic():
+                first = self.generate(seed=1)
+                raise Rollback
+        except Rollback:
+            pass
+        self.assertEqual(self.generate(seed=1), first)
+        self.assertEqual(Post.objects.count(), SIZES['posts'])
+        self.assertEqual(Comment.objects.count(), SIZES['comments'])
+        self.assertEqual(Follow.objects.count(), SIZES['follows'])
+
+    def test_run_reports_every_page(self):
+        """Прогон проходит все страницы posts и считает метрики"""
+        generate_dataset(SIZES)
+        results = run_benchmark(requests=2, warmup=0)
+        self.assertIn('post_detail', results)
+        for name, row in results.items():
+            with self.subTest(page=name):
+                self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+                self.assertGreater(row['queries'], 0)
+                self.assertGreater(row['alloc_peak_kib'], 0)
+
+    def test_percentile(self):
+        """Процентиль считается методом ближайшего ранга"""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Post, User
+
+
+@override_settings(POSTS_COMMENTS_PER_PAGE=3)
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.post = Post.objects.create(text='Текст поста', author=cls.author)
+        now = timezone.now()
+        for i in range(7):
+            comment = Comment.objects.create(
+                post=cls.post, author=cls.author, text=f'Комментарий {i}'
+            )
+            # Два комментария с одной датой: порядок решает id
+            Comment.objects.filter(pk=comment.pk).update(
+                created=now - timedelta(minutes=min(i, 4))
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+        self.comments_url = reverse(
+            'posts:comments', kwargs={'post_id': self.post.pk}
+        )
+
+    def test_first_page_has_newest_comments(self):
+        """Страница поста показывает только N самых новых комментариев"""
+        response = self.client.get(self.detail_url)
+        texts = [comment.text for comment in response.context['comments']]
+        self.assertEqual(texts, ['Комментарий 0', 'Комментарий 1',
+                                 'Комментарий 2'])
+        self.assertIsNotNone(response.context['comments_next_cursor'])
+        self.assertContains(response, self.comments_url)
+
+    def test_older_comments_loaded_by_cursor(self):
+        """Курсор отдаёт все остальные комментарии без пропусков и повторов"""
+        cursor = self.client.get(
+            self.detail_url
+        ).context['comments_next_cursor']
+        pages = []
+        while cursor:
+            data = self.client.get(
+                self.comments_url, {'cursor': cursor}
+            ).json()
+            pages.append(data['html'])
+            cursor = data['next_cursor']
+        html = ''.join(pages)
+        for i in range(7):
+            with self.subTest(comment=i):
+                self.assertEqual(html.count(f'Комментарий {i}'), int(i >= 3))
+        self.assertEqual(len(pages), 2)
+
+    def test_short_thread_has_no_cursor(self):
+        post = Post.objects.create(text='Тихий пост', author=self.author)
+        Comment.objects.create(post=post, author=self.author, text='Один')
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertIsNone(response.context['comments_next_cursor'])
+        self.assertNotContains(response, 'Показать ещё')
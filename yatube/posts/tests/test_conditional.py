@@ -0,0 +1,93 @@
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+from .test_fragment_cache import committed
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.author, group=cls.group
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.author}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def etag(self, url, client=None):
+        return (client or self.client).get(url)['ETag']
+
+    def test_not_modified_without_render(self):
+        """Совпавший ETag даёт 304 без рендеринга шаблона"""
+        for client in (self.client, self.reader_client):
+            for url in self.urls:
+                with self.subTest(url=url, user=client is self.client):
+                    etag = self.etag(url, client)
+                    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 304)
+                    self.assertEqual(response.templates, [])
+
+    def test_if_modified_since_for_anonymous(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                modified = self.client.get(url)['Last-Modified']
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=modified
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_logged_in_page_has_own_etag(self):
+        """Страница пользователя не совпадает с анонимной и не получает
+        Last-Modified"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.reader_client.get(url)
+                self.assertNotEqual(response['ETag'], self.etag(url))
+                self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_changes_update_etag(self):
+        """Новый комментарий, правка поста и подписка меняют ETag"""
+        changes = (
+            lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'
+            ),
+            lambda: Post.objects.filter(pk=self.post.pk).first().save(),
+        )
+        for change in changes:
+            before = [self.etag(url) for url in self.urls]
+            with committed():
+                change()
+            after = [self.etag(url) for url in self.urls]
+            for url, old, new in zip(self.urls, before, after):
+                with self.subTest(url=url):
+                    self.assertNotEqual(old, new)
+        profile = self.urls[2]
+        etag = self.etag(profile, self.reader_client)
+        with committed():
+            Follow.objects.create(user=self.reader, author=self.author)
+        self.assertNotEqual(self.etag(profile, self.reader_client), etag)
+
+    def test_missing_pages_are_404(self):
+        for url in (
+            reverse('posts:group_list', kwargs={'slug': 'missing'}),
+            reverse('posts:profile', kwargs={'username': 'missing'}),
+            reverse('posts:post_detail', kwargs={'post_id': 0}),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
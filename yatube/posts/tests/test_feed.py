@@ -0,0 +1,69 @@
+from django.test import TestCase, Client
+from django.urls import reverse
+from ..feed import rebuild_feeds
+from ..models import Post, User, Follow, FeedItem
+
+
+class FollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.other_author = User.objects.create_user(username='OtherAuthor')
+        cls.follower = User.objects.create_user(username='Follower')
+        cls.old_post = Post.objects.create(
+            text='Пост до подписки',
+            author=cls.author,
+        )
+        Post.objects.create(
+            text='Пост другого автора',
+            author=cls.other_author,
+        )
+
+    def setUp(self):
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def follow_page(self):
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_feed(self):
+        """После подписки в ленте появляются старые посты автора"""
+        self.follower_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}
+        ))
+        self.assertEqual(self.follow_page(), [self.old_post])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост автора попадает в ленты подписчиков"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        new_post = Post.objects.create(
+            text='Пост после подписки',
+            author=self.author,
+        )
+        self.assertEqual(self.follow_page(), [new_post, self.old_post])
+        self.assertFalse(
+            FeedItem.objects.filter(user=self.author).exists()
+        )
+
+    def test_unfollow_trims_feed(self):
+        """После отписки посты автора пропадают из ленты"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.follower, author=self.other_author)
+        self.follower_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}
+        ))
+        feed = self.follow_page()
+        self.assertEqual(len(feed), 1)
+        self.assertEqual(feed[0].author, self.other_author)
+
+    def test_rebuild_feeds_fills_missing_items(self):
+        """Перестройка дополняет ленты без дублей записей"""
+        Follow.objects.bulk_create([
+            Follow(user=self.follower, author=self.author),
+            Follow(user=self.follower, author=self.other_author),
+        ])
+        self.assertEqual(rebuild_feeds(), 2)
+        self.assertEqual(rebuild_feeds(), 0)
+        self.assertEqual(len(self.follow_page()), 2)
@@ -0,0 +1,170 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import OperationalError, connection, connections
+from django.test import TestCase, TransactionTestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..follows import follow_authors, unfollow_authors
+from ..models import FeedItem, Follow, Post, User, UserStats
+
+
+class FollowServiceTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.authors = [
+            User.objects.create_user(username=f'Author{i}') for i in range(3)
+        ]
+        for author in cls.authors:
+            Post.objects.create(text=f'Пост {author}', author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def follow_url(self, username, action='profile_follow'):
+        return reverse(f'posts:{action}', kwargs={'username': username})
+
+    def test_repeated_follow_is_one_statement(self):
+        """Повторная подписка -- один INSERT без ошибки и без дубля"""
+        url = self.follow_url(self.authors[0])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        writes = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ]
+        self.assertEqual(len(writes), 1)
+        self.assertRedirects(
+            response, reverse('posts:profile', args=[self.authors[0]])
+        )
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.authors[0]).followers_count, 1
+        )
+
+    def test_self_and_unknown_authors_are_ignored(self):
+        self.client.get(self.follow_url(self.reader))
+        self.client.get(self.follow_url('missing'))
+        self.assertFalse(Follow.objects.exists())
+
+    def test_unfollow_updates_derived_data(self):
+        author = self.authors[0]
+        follow_authors(self.reader, User.objects.filter(pk=author.pk))
+        self.assertTrue(FeedItem.objects.filter(user=self.reader).exists())
+        self.client.get(self.follow_url(author, 'profile_unfollow'))
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(FeedItem.objects.filter(user=self.reader).exists())
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 0
+        )
+        self.assertEqual(
+            unfollow_authors(self.reader, User.objects.filter(pk=author.pk)),
+            []
+        )
+
+    def test_orm_fallback_counts_only_new_follows(self):
+        """Без RETURNING счётчики растут только на созданные подписки"""
+        authors = User.objects.filter(pk__in=[a.pk for a in self.authors])
+        with mock.patch(
+            'posts.follows._returning_supported', return_value=False
+        ):
+            follow_authors(
+                self.reader, User.objects.filter(pk=self.authors[0].pk)
+            )
+            followed = follow_authors(self.reader, authors)
+            self.assertEqual(follow_authors(self.reader, authors), [])
+        self.assertCountEqual(
+            followed, [author.pk for author in self.authors[1:]]
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 3
+        )
+        for author in self.authors:
+            self.assertEqual(
+                UserStats.objects.get(user=author).followers_count, 1
+            )
+        self.assertEqual(FeedItem.objects.filter(user=self.reader).count(), 3)
+
+    def test_follow_many(self):
+        """Подписка на нескольких авторов одним запросом"""
+        follow_authors(self.reader, User.objects.filter(pk=self.authors[0].pk))
+        response = self.client.post(
+            reverse('posts:follow_many'),
+            {'username': [author.username for author in self.authors]},
+        )
+        self.assertCountEqual(
+            response.json()['followed'],
+            [author.pk for author in self.authors[1:]],
+        )
+        self.assertEqual(Follow.objects.filter(user=self.reader).count(), 3)
+        self.assertEqual(FeedItem.objects.filter(user=self.reader).count(), 3)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 3
+        )
+
+    def test_profile_shows_new_follow(self):
+        """Подписка сбрасывает закэшированный профиль"""
+        profile_url = reverse('posts:profile', args=[self.authors[0]])
+        self.client.get(profile_url)
+        self.client.get(self.follow_url(self.authors[0]))
+        response = self.client.get(profile_url)
+        self.assertTrue(response.context['following'])
+        self.assertEqual(response.context['followers_count'], 1)
+
+
+def get_while_locked(client, url, attempts=100):
+    # Тестовая база в памяти с общим кэшем не ждёт блокировку,
+    # а сразу отказывает: кликаем снова
+    for _ in range(attempts):
+        try:
+            return client.get(url)
+        except OperationalError:
+            time.sleep(0.01)
+
+
+class FollowConcurrencyTests(TransactionTestCase):
+
+    def test_concurrent_clicks(self):
+        """Одновременные клики «подписаться» дают одну подписку"""
+        reader = User.objects.create_user(username='Reader')
+        author = User.objects.create_user(username='Author')
+        url = reverse('posts:profile_follow', kwargs={'username': author})
+        clients = [Client() for _ in range(8)]
+        for client in clients:
+            client.force_login(reader)
+        errors = []
+        start = threading.Barrier(len(clients))
+
+        def click(client):
+            start.wait()
+            try:
+                for _ in range(5):
+                    get_while_locked(client, url)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=click, args=(client,))
+            for client in clients
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            UserStats.objects.get(user=author).followers_count, 1
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=reader).following_count, 1
+        )
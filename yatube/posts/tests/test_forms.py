@@ -50,7 +50,11 @@ class PostFormTests(TestCase):
         form_data = {
             'text': 'Тестовый текст',
             'group': self.group_1.id,
-            'image': self.image,
+            'image': SimpleUploadedFile(
+                name='new.gif',
+                content=SMALL_GIF,
+                content_type='image/gif'
+            ),
         }
         response = self.authorized_client_author.post(
             reverse('posts:post_create'),
@@ -0,0 +1,334 @@
+import threading
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, Client
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.routers import PIN_COOKIE
+
+from ..bundles import KEY as BUNDLE_KEY
+from ..models import Follow, Post, Group, User
+from .test_follows import get_while_locked
+
+
+@contextmanager
+def committed(using=DEFAULT_DB_ALIAS):
+    """Выполняет на выходе действия, отложенные в блоке до фиксации
+    транзакции (transaction.on_commit): транзакцию TestCase никто
+    не фиксирует, а поколения фрагментов сдвигаются только после неё."""
+    start = len(connections[using].run_on_commit)
+    yield
+    for _, callback in connections[using].run_on_commit[start:]:
+        callback()
+
+
+class FragmentCacheVersionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_group',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Исходный текст', author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def assertPagesContain(self, text):
+        for url in self.pages:
+            with self.subTest(url=url):
+                self.assertContains(self.author_client.get(url), text)
+
+    def test_fragments_are_served_from_cache(self):
+        """Без записи через приложение страницы отдаются из кэша"""
+        self.assertPagesContain('Исходный текст')
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
+        self.assertPagesContain('Исходный текст')
+
+    def test_post_edit_invalidates_fragments(self):
+        """Редактирование поста сразу видно на всех страницах"""
+        self.assertPagesContain('Исходный текст')
+        with committed():
+            self.author_client.post(
+                reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+                {'text': 'Новый текст', 'group': self.group.pk},
+            )
+        self.assertPagesContain('Новый текст')
+
+    def test_new_post_and_comment_invalidate_fragments(self):
+        """Новый пост и комментарий сразу видны на страницах"""
+        self.assertPagesContain('Исходный текст')
+        with committed():
+            self.author_client.post(
+                reverse('posts:post_create'),
+                {'text': 'Свежий пост', 'group': self.group.pk},
+            )
+        for url in self.pages[:3]:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.author_client.get(url), 'Свежий пост'
+                )
+        with committed():
+            self.author_client.post(
+                reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+                {'text': 'Свежий комментарий'},
+            )
+        self.assertContains(
+            self.author_client.get(self.pages[-1]), 'Свежий комментарий'
+        )
+
+    def test_group_and_author_rename_invalidate_fragments(self):
+        """Новое название группы и имя автора видны на всех страницах"""
+        self.assertPagesContain('Исходный текст')
+        self.group.title = 'Переименованная группа'
+        with committed():
+            self.group.save()
+        for url in (self.pages[1], self.pages[3]):
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.author_client.get(url), 'Переименованная группа'
+                )
+        self.author.first_name = 'Лев'
+        self.author.last_name = 'Толстой'
+        with committed():
+            self.author.save()
+        self.assertPagesContain('Лев Толстой')
+
+
+class PostBundleTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.post = Post.objects.create(text='Текст поста', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+
+    def test_hot_post_served_from_cache(self):
+        """Повторный показ поста не обращается к таблицам posts"""
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Текст поста')
+        self.assertEqual(len(queries), 0)
+
+    def test_missing_post_is_404(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_edit_and_comment_invalidate_bundle(self):
+        """Правка поста и комментарий пересобирают пакет страницы"""
+        self.client.get(self.url)
+        with committed():
+            self.author_client.post(
+                reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+                {'text': 'Исправленный текст'},
+            )
+        self.assertContains(self.client.get(self.url), 'Исправленный текст')
+        with committed():
+            self.author_client.post(
+                reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+                {'text': 'Первый комментарий'},
+            )
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Первый комментарий')
+
+    def test_new_author_post_updates_count(self):
+        """Новый пост автора меняет счётчик на странице старого поста"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['posts_count'], 1)
+        with committed():
+            Post.objects.create(text='Ещё пост', author=self.author)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['posts_count'], 2)
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_group', description='Описание'
+        )
+        Post.objects.create(
+            text='Первый пост', author=cls.author, group=cls.group
+        )
+        cls.profile_url = reverse(
+            'posts:profile', kwargs={'username': cls.author}
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            cls.profile_url,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_hot_pages_skip_database(self):
+        """Повторный показ анониму не обращается к базе"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(len(queries), 0)
+                self.assertEqual(response.content, first.content)
+                self.assertIn('Cookie', response['Vary'])
+                self.assertEqual(self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                ).status_code, 304)
+
+    def test_writes_invalidate_pages(self):
+        """Новый пост и подписка сбрасывают закэшированные страницы"""
+        for url in self.urls:
+            self.client.get(url)
+        with committed():
+            Post.objects.create(
+                text='Второй пост', author=self.author, group=self.group
+            )
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Второй пост')
+        with committed():
+            Follow.objects.create(user=self.reader, author=self.author)
+        self.assertContains(
+            self.client.get(self.profile_url), 'Подписчиков: 1'
+        )
+
+    def test_query_string_is_part_of_key(self):
+        self.client.get(self.urls[0])
+        response = self.client.get(self.urls[0], {'page': 2})
+        self.assertIsNotNone(response.context)
+
+    def test_unknown_params_bypass_cache(self):
+        """Посторонние параметры не создают новых записей в кэше"""
+        self.client.get(self.urls[0], {'x': 1})
+        response = self.client.get(self.urls[0], {'x': 1})
+        self.assertIsNotNone(response.context)
+        self.client.get(self.urls[0], {'page': 1})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.urls[0], {'page': 1})
+        self.assertEqual(len(queries), 0)
+
+    def test_logged_in_users_bypass_cache(self):
+        reader_client = Client()
+        reader_client.force_login(self.reader)
+        for url in self.urls:
+            self.client.get(url)
+            with self.subTest(url=url):
+                self.assertContains(reader_client.get(url), 'Выйти')
+
+
+# Основная база в роли реплики: чтения идут через ReplicaRouter
+@override_settings(DATABASE_REPLICAS=['default'])
+class ReplicaCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.post = Post.objects.create(
+            text='Исходный текст', author=cls.author
+        )
+        cls.url = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk}
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_recent_changes_are_not_cached_from_replicas(self):
+        """Пока реплика может отставать, прочитанное с неё не кэшируется"""
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
+        self.assertContains(self.client.get(self.url), 'Тихая правка')
+        self.assertIsNone(cache.get(BUNDLE_KEY.format(self.post.pk)))
+        self.client.get(reverse('posts:index'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:index'))
+        self.assertGreater(len(queries), 0)
+        with self.settings(REPLICA_PIN_SECONDS=0):
+            self.client.get(self.url)
+        self.assertIsNotNone(cache.get(BUNDLE_KEY.format(self.post.pk)))
+
+    @override_settings(REPLICA_PIN_SECONDS=0)
+    def test_pinned_client_bypasses_caches(self):
+        """Закреплённый за основной базой клиент получает свежие данные
+        и обновляет ими кэш"""
+        urls = (self.url, reverse('posts:index'))
+        for url in urls:
+            self.client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Исходный текст')
+        pinned_client = Client()
+        pinned_client.cookies[PIN_COOKIE] = '1'
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(pinned_client.get(url), 'Тихая правка')
+                self.assertContains(self.client.get(url), 'Тихая правка')
+
+
+class CommitOrderTests(TransactionTestCase):
+
+    def test_reader_during_write_does_not_cache_stale_page(self):
+        """Читатель, пришедший до фиксации чужой записи, не кладёт старую
+        ленту в кэш под новым поколением"""
+        cache.clear()
+        author = User.objects.create_user(username='Author')
+        Post.objects.create(text='Первый пост', author=author)
+        url = reverse('posts:index')
+        self.client.get(url)
+        created, release = threading.Event(), threading.Event()
+
+        def write():
+            try:
+                with transaction.atomic():
+                    Post.objects.create(text='Второй пост', author=author)
+                    created.set()
+                    release.wait(5)
+            finally:
+                connections.close_all()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            created.wait(5)
+            # Таблица постов заблокирована до фиксации: пока поколения
+            # не сдвинуты, страница отдаётся из кэша без обращения к базе
+            response = get_while_locked(self.client, url, attempts=20)
+        finally:
+            release.set()
+            writer.join()
+        self.assertIsNotNone(response)
+        self.assertNotContains(response, 'Второй пост')
+        response = self.client.get(url, {'page': 1})
+        self.assertContains(response, 'Первый пост')
+        self.assertContains(response, 'Второй пост')
@@ -0,0 +1,64 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post, Group, User, Comment, Follow
+
+NUMBER_OF_TEST_POSTS = 12
+
+
+class ListingQueryCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_group',
+            description='Тестовое описание',
+        )
+        for i in range(NUMBER_OF_TEST_POSTS):
+            author = User.objects.create_user(
+                username=f'Author{i}', first_name='Имя', last_name=f'{i}'
+            )
+            Follow.objects.create(user=cls.reader, author=author)
+            post = Post.objects.create(
+                text=f'Тестовый пост {i}', author=author, group=cls.group
+            )
+            Comment.objects.create(post=post, author=cls.reader, text='!')
+        cls.author = author
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        """Число запросов ленты не растёт вместе с POSTS_PER_PAGE"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with override_settings(POSTS_PER_PAGE=1):
+                    small_page = self.count_queries(url)
+                with override_settings(POSTS_PER_PAGE=NUMBER_OF_TEST_POSTS):
+                    full_page = self.count_queries(url)
+                self.assertEqual(small_page, full_page)
+
+    def test_listing_annotates_comment_count(self):
+        """В ленте у постов есть число комментариев"""
+        response = self.client.get(reverse('posts:index'))
+        for post in response.context['page_obj']:
+            self.assertEqual(post.comment_count, 1)
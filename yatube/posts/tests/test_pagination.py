@@ -1,6 +1,11 @@
-from django.test import TestCase
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from ..models import Post, Group, User
+from ..paginators import CursorPage, CursorPaginator
 from django.conf import settings
 
 NUMBER_OF_TEST_POSTS = 16
@@ -55,3 +60,100 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(len(
                     response.context.get('page_obj').object_list
                 ), number_of_posts_on_last_page)
+
+
+@override_settings(POSTS_KEYSET_PAGINATION=True)
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestUser')
+        Post.objects.bulk_create([
+            Post(text=f'Тестовый пост {i+1}', author=cls.author)
+            for i in range(NUMBER_OF_TEST_POSTS)
+        ])
+        cls.expected = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def walk(self, url, cursor=None, backwards=False):
+        pages = []
+        while True:
+            params = {'cursor': cursor} if cursor else {}
+            page_obj = self.client.get(url, params).context['page_obj']
+            self.assertIsInstance(page_obj, CursorPage)
+            pages.append(list(page_obj))
+            cursor = (
+                page_obj.previous_cursor if backwards
+                else page_obj.next_cursor
+            )
+            if cursor is None:
+                return pages, page_obj
+
+    def test_cursor_pages_cover_all_posts_in_order(self):
+        """Keyset-паджинатор проходит все посты вперёд и назад"""
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': self.author}),
+        ):
+            with self.subTest(url=url):
+                pages, last_page = self.walk(url)
+                self.assertEqual(sum(pages, []), self.expected)
+                self.assertEqual(len(pages[0]), settings.POSTS_PER_PAGE)
+                back_pages, first_page = self.walk(
+                    url, last_page.previous_cursor, backwards=True
+                )
+                self.assertEqual(back_pages[-1], pages[0])
+                self.assertFalse(first_page.has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Испорченный курсор открывает первую страницу"""
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': '!!!'}
+        )
+        self.assertEqual(
+            list(response.context['page_obj']),
+            self.expected[:settings.POSTS_PER_PAGE]
+        )
+
+
+class CursorPaginatorPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        User.objects.bulk_create([
+            User(username=f'Author{i}') for i in range(20)
+        ])
+        authors = list(User.objects.all())
+        cls.author = authors[0]
+        now = timezone.now()
+        # По три поста на секунду: курсор упирается в одинаковые даты
+        Post.objects.bulk_create([
+            Post(
+                text=f'Тестовый пост {i}',
+                author=authors[i % len(authors)],
+                pub_date=now - timedelta(seconds=i // 3),
+            )
+            for i in range(2000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def test_seek_uses_single_index_range(self):
+        """Переход по курсору читает один диапазон индекса по дате,
+        а не объединение нескольких обходов (MULTI-INDEX OR)"""
+        paginator = CursorPaginator(
+            Post.objects.for_listing().filter(author=self.author), 10
+        )
+        cursor = paginator.get_page().next_cursor
+        queries = []
+
+        def capture(execute, sql, params, many, context):
+            queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            self.assertEqual(len(paginator.get_page(cursor)), 10)
+        sql, params = queries[0]
+        with connection.cursor() as db_cursor:
+            db_cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = [row[-1] for row in db_cursor.fetchall()]
+        self.assertNotIn('MULTI-INDEX OR', plan)
@@ -0,0 +1,111 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.urls import reverse
+
+from core.budgets import QueryBudgetExceeded, iter_patterns, query_budget
+
+from ..models import Comment, Follow, Group, Post, User
+from ..thumbnails import generate_thumbnails
+from .test_views import SMALL_GIF
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+# Данные для POST-запросов к изменяющим представлениям
+POST_DATA = {
+    'posts:post_create': {'text': 'Новый пост'},
+    'posts:post_edit': {'text': 'Исправленный пост'},
+    'posts:add_comment': {'text': 'Комментарий'},
+}
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    QUERY_BUDGET_RAISE=True,
+    THUMBNAIL_PREGENERATE_WORKERS=0,
+)
+class QueryBudgetTests(TestCase):
+    """Каждый адрес posts укладывается в свой бюджет запросов на ленте
+    больше одной страницы, с картинками и комментариями."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_group', description='Описание'
+        )
+        for i in range(settings.POSTS_PER_PAGE + 2):
+            cls.post = Post.objects.create(
+                text=f'Пост номер {i}',
+                author=cls.author,
+                group=cls.group,
+                image=SimpleUploadedFile(
+                    name=f'budget_{i}.gif',
+                    content=SMALL_GIF,
+                    content_type='image/gif',
+                ),
+            )
+            generate_thumbnails(cls.post.image)
+            for author in (cls.author, cls.reader):
+                Comment.objects.create(
+                    post=cls.post, author=author, text='Комментарий'
+                )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def url_kwargs(self, pattern):
+        values = {
+            'slug': self.group.slug,
+            'username': self.reader.username,
+            'post_id': self.post.pk,
+        }
+        return {name: values[name] for name in pattern.pattern.converters}
+
+    def test_every_url_within_budget(self):
+        """Все адреса posts.urls проверяются автоматически"""
+        for pattern in iter_patterns('posts.urls'):
+            name = f'posts:{pattern.name}'
+            url = reverse(name, kwargs=self.url_kwargs(pattern))
+            requests = [('get', None)]
+            if name in POST_DATA:
+                requests.append(('post', POST_DATA[name]))
+            for method, data in requests:
+                with self.subTest(url=url, method=method):
+                    getattr(self.client, method)(url, data or {})
+
+
+class QueryBudgetDecoratorTests(TestCase):
+
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+
+    @staticmethod
+    @query_budget(1)
+    def view(request):
+        list(User.objects.all())
+        list(Group.objects.all())
+        return HttpResponse()
+
+    @override_settings(QUERY_BUDGET_RAISE=True)
+    def test_raises(self):
+        with self.assertRaisesRegex(QueryBudgetExceeded, '2 запросов'):
+            self.view(self.request)
+
+    @override_settings(QUERY_BUDGET_RAISE=False)
+    def test_logs(self):
+        with self.assertLogs('core.budgets', 'WARNING'):
+            self.assertEqual(self.view(self.request).status_code, 200)
+        self.assertEqual(self.view.query_budget, 1)
@@ -0,0 +1,152 @@
+import re
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..feed import rebuild_feeds
+from ..models import Post, Group, User, Comment, Follow
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?(?P<table>\w+)$')
+# Сортировка во временном B-дереве (в том числе хвоста ключа -- RIGHT
+# PART OF ORDER BY) и объединение обходов индексов (MULTI-INDEX OR)
+BAD_STEPS = ('TEMP B-TREE', 'MULTI-INDEX OR')
+# Форма поста выводит в выпадающем списке все группы целиком
+FULL_SCAN_ALLOWED = {'posts_group'}
+NUMBER_OF_AUTHORS = 20
+NUMBER_OF_POSTS = 2000
+NUMBER_OF_COMMENTS = 200
+
+
+class QueryPlanTests(TestCase):
+    """Запросы страниц posts не должны читать таблицы целиком
+    и сортировать выборку во временном B-дереве.
+
+    На паре строк SQLite выбирает план наугад, поэтому таблицы
+    заполняются с повторяющимися датами и собирается статистика
+    (ANALYZE), а EXPLAIN получает те же параметры, что и запрос."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Author')
+        User.objects.bulk_create([
+            User(username=f'Author{i}') for i in range(NUMBER_OF_AUTHORS)
+        ])
+        authors = list(User.objects.exclude(pk=cls.user.pk))
+        groups = [
+            Group.objects.create(
+                title=f'Тестовая группа {i}',
+                slug=f'test_group_{i}',
+                description='Тестовое описание',
+            )
+            for i in range(3)
+        ]
+        cls.group = groups[0]
+        now = timezone.now()
+        Post.objects.bulk_create([
+            Post(
+                text=f'Тестовый пост {i}',
+                author=authors[i % len(authors)],
+                group=groups[i % len(groups)] if i % 4 else None,
+                pub_date=now - timedelta(seconds=i // 3),
+            )
+            for i in range(NUMBER_OF_POSTS)
+        ])
+        cls.post = Post.objects.filter(author=cls.author).first()
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(NUMBER_OF_COMMENTS)
+        ])
+        Follow.objects.bulk_create([
+            Follow(user=cls.user, author=author) for author in authors[:5]
+        ])
+        rebuild_feeds()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.user)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def bad_plan_steps(self, client, url):
+        queries = []
+
+        def capture(execute, sql, params, many, context):
+            queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            client.get(url)
+        problems = []
+        for sql, params in queries:
+            if not sql.startswith('SELECT'):
+                continue
+            for step in self.explain(sql, params):
+                scan = FULL_SCAN.match(step)
+                if (
+                    scan and scan.group('table') not in FULL_SCAN_ALLOWED
+                    or any(bad in step for bad in BAD_STEPS)
+                ):
+                    problems.append((step, sql))
+        return problems
+
+    def test_views_use_indexes(self):
+        """Все запросы представлений posts идут по индексам"""
+        author = self.author.username
+        pages = {
+            reverse('posts:index'): self.reader_client,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}):
+            self.reader_client,
+            reverse('posts:profile', kwargs={'username': author}):
+            self.reader_client,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}):
+            self.reader_client,
+            reverse('posts:follow_index'): self.reader_client,
+            reverse('posts:post_create'): self.author_client,
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}):
+            self.author_client,
+            reverse('posts:profile_unfollow', kwargs={'username': author}):
+            self.reader_client,
+            reverse('posts:profile_follow', kwargs={'username': author}):
+            self.reader_client,
+        }
+        for url, client in pages.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.bad_plan_steps(client, url), [])
+
+    @override_settings(POSTS_KEYSET_PAGINATION=True)
+    def test_keyset_pages_use_indexes(self):
+        """Переход по курсору не сортирует выборку и не читает её целиком"""
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:follow_index'),
+        ):
+            page_obj = self.reader_client.get(url).context['page_obj']
+            with self.subTest(url=url):
+                self.assertEqual(self.bad_plan_steps(
+                    self.reader_client, f'{url}?cursor={page_obj.next_cursor}'
+                ), [])
+
+    def test_comment_pages_use_indexes(self):
+        """Подгрузка старых комментариев идёт по индексу поста и даты"""
+        url = reverse('posts:comments', kwargs={'post_id': self.post.pk})
+        cursor = self.reader_client.get(url).json()['next_cursor']
+        self.assertEqual(
+            self.bad_plan_steps(self.reader_client, f'{url}?cursor={cursor}'),
+            []
+        )
@@ -0,0 +1,93 @@
+from urllib.parse import urlencode
+
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post, User
+from ..search import rebuild_index
+
+
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.short = Post.objects.create(
+            text='Котики', author=cls.user
+        )
+        cls.long = Post.objects.create(
+            text='Длинный рассказ о погоде, в конце которого котики',
+            author=cls.user,
+        )
+        cls.other = Post.objects.create(
+            text='Пост про собак', author=cls.user
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return list(response.context['page_obj'])
+
+    def test_search_ranks_matches(self):
+        """Поиск находит посты по префиксу слова и ранжирует их"""
+        self.assertEqual(self.search('кот'), [self.short, self.long])
+        self.assertEqual(self.search('КОТИКИ погод'), [self.long])
+
+    def test_search_follows_changes(self):
+        """Индекс обновляется при изменении и удалении поста"""
+        self.other.text = 'Пост про котиков'
+        self.other.save()
+        self.assertIn(self.other, self.search('котиков'))
+        self.other.delete()
+        self.assertEqual(self.search('котиков'), [])
+
+    def test_search_ignores_query_syntax(self):
+        """Спецсимволы запроса не ломают поиск"""
+        for query in ('"котики', 'котики OR -(', '*', ''):
+            with self.subTest(query=query):
+                response = self.guest_client.get(
+                    reverse('posts:search'), {'q': query}
+                )
+                self.assertEqual(response.status_code, 200)
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_search_keyset_pages(self):
+        """Выдача листается курсором с сохранением запроса"""
+        response = self.guest_client.get(reverse('posts:search'), {'q': 'кот'})
+        page_obj = response.context['page_obj']
+        query_string = urlencode({'q': 'кот', 'cursor': page_obj.next_cursor})
+        self.assertContains(response, query_string.replace('&', '&amp;'))
+        self.assertEqual(
+            self.search('кот', cursor=page_obj.next_cursor), [self.long]
+        )
+
+    def test_rebuild_index(self):
+        """Посты, созданные в обход сигналов, попадают в индекс"""
+        Post.objects.bulk_create([Post(text='Лисички', author=self.user)])
+        self.assertEqual(self.search('лисички'), [])
+        rebuild_index()
+        self.assertEqual(len(self.search('лисички')), 1)
+
+    def test_admin_uses_index(self):
+        """Поиск в админке идёт по индексу, а не через LIKE"""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        admin_client = Client()
+        admin_client.force_login(admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = admin_client.get(
+                reverse('admin:posts_post_changelist'), {'q': 'котики'}
+            )
+        self.assertEqual(
+            set(response.context['cl'].result_list), {self.short, self.long}
+        )
+        self.assertFalse(
+            any('LIKE' in query['sql'] for query in queries.captured_queries)
+        )
@@ -0,0 +1,175 @@
+import io
+import json
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default
+
+from ..models import Post, User
+from ..thumbnails import (
+    generate_thumbnails, resolve_thumbnails, variant_formats,
+)
+from .test_fragment_cache import committed
+from .test_views import SMALL_GIF
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_PREGENERATE_WORKERS=0
+)
+class ThumbnailPregenerationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def upload(self, name):
+        return SimpleUploadedFile(
+            name=name, content=SMALL_GIF, content_type='image/gif'
+        )
+
+    def assert_served_without_engine(self, url):
+        with mock.patch.object(default, 'engine') as engine:
+            response = self.authorized_client.get(url)
+        self.assertContains(response, '<img class="card-img')
+        engine.get_image.assert_not_called()
+
+    def test_create_pregenerates_thumbnails(self):
+        """Миниатюры нового поста готовы до первого показа ленты"""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': self.upload('a.gif')},
+        )
+        self.assertTrue(Post.objects.filter(image='posts/a.gif').exists())
+        self.assert_served_without_engine(reverse('posts:index'))
+
+    def test_create_builds_responsive_variants(self):
+        """Для нового изображения строятся варианты под srcset"""
+        with committed():
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={
+                    'text': 'Пост с картинкой', 'image': self.upload('v.gif')
+                },
+            )
+        post = Post.objects.get(image='posts/v.gif')
+        widths = [source['width'] for source in json.loads(
+            post.image_variants
+        )]
+        self.assertEqual(
+            widths,
+            settings.POSTS_IMAGE_VARIANT_WIDTHS * len(variant_formats()),
+        )
+        response = self.authorized_client.get(reverse('posts:index'))
+        for source in post.image_sources:
+            self.assertContains(response, f'type="{source["type"]}"')
+            self.assertContains(response, source['srcset'])
+
+    @override_settings(POSTS_IMAGE_VARIANT_FORMATS=['WEBP'])
+    def test_edit_replaces_variants(self):
+        """Новое изображение заменяет варианты старого"""
+        post = Post.objects.create(
+            text='Пост', author=self.user, image=self.upload('old.gif'),
+            image_variants='[{"name": "old.webp", "width": 1, '
+                           '"type": "image/webp"}]',
+        )
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': 'Пост', 'image': self.upload('new.gif')},
+        )
+        post.refresh_from_db()
+        self.assertNotIn('old.webp', post.image_variants)
+        self.assertEqual(
+            [source['type'] for source in post.image_sources], ['image/webp']
+        )
+
+    def test_edit_pregenerates_thumbnails(self):
+        """Смена изображения при редактировании строит новые миниатюры"""
+        post = Post.objects.create(text='Пост', author=self.user)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': 'Пост', 'image': self.upload('b.gif')},
+        )
+        self.assert_served_without_engine(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+
+    def test_command_backfills_thumbnails(self):
+        """Команда строит миниатюры для уже загруженных изображений"""
+        Post.objects.create(
+            text='Старый пост', author=self.user, image=self.upload('c.gif')
+        )
+        call_command('pregenerate_thumbnails', stdout=io.StringIO())
+        self.assert_served_without_engine(reverse('posts:index'))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailBatchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}',
+                author=cls.user,
+                image=SimpleUploadedFile(
+                    name=f'batch_{i}.gif',
+                    content=SMALL_GIF,
+                    content_type='image/gif'
+                ),
+            )
+            for i in range(3)
+        ]
+        for post in cls.posts:
+            generate_thumbnails(post.image)
+
+    def images(self):
+        return [post.image for post in self.posts]
+
+    def test_warm_cache_single_get_many(self):
+        """Готовые миниатюры страницы берутся одним get_many из кэша"""
+        resolve_thumbnails(self.images())
+        spy = mock.patch.object(cache, 'get_many', wraps=cache.get_many)
+        with spy as get_many, self.assertNumQueries(0):
+            thumbnails = resolve_thumbnails(self.images())
+        get_many.assert_called_once()
+        self.assertEqual(len(thumbnails), len(self.posts))
+
+    def test_cold_cache_single_query(self):
+        """При пустом кэше все миниатюры читаются одним запросом"""
+        cache.clear()
+        with self.assertNumQueries(1):
+            thumbnails = resolve_thumbnails(self.images())
+        for post in self.posts:
+            self.assertTrue(thumbnails[post.image.name].exists())
+
+    def test_missing_thumbnail_generated(self):
+        """Отсутствующая миниатюра строится по требованию"""
+        post = Post.objects.create(
+            text='Новый пост',
+            author=self.user,
+            image=SimpleUploadedFile(
+                name='fresh.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+        thumbnail = resolve_thumbnails([post.image])[post.image.name]
+        self.assertTrue(thumbnail.exists())
+        self.assertEqual(thumbnail.x, 960)
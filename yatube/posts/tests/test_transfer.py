@@ -0,0 +1,134 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..models import Comment, FeedItem, Follow, Group, Post, User
+from ..transfer import export_rows, import_rows, write_rows
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+PUB_DATE = datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+
+class TransferCommandsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_group', description='Описание'
+        )
+        for i in range(5):
+            post = Post.objects.create(
+                text=f'Пост номер {i}', author=cls.author, group=cls.group
+            )
+            Comment.objects.create(
+                post=post, author=cls.reader, text=f'Комментарий {i}'
+            )
+        Post.objects.update(pub_date=PUB_DATE)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(TEMP_DIR, name)
+
+    def export(self, model, path, *args):
+        call_command(
+            'export_data', model, '-o', path, *args, stderr=io.StringIO()
+        )
+
+    def load(self, model, path, *args):
+        call_command(
+            'import_data', model, '-i', path, *args, stdout=io.StringIO()
+        )
+
+    def test_round_trip(self):
+        """Выгрузка и загрузка сохраняют данные и пересчитывают производные"""
+        for file_format in ('jsonl', 'csv'):
+            with self.subTest(file_format=file_format):
+                dumps = {
+                    model: self.path(f'{model}.{file_format}')
+                    for model in ('posts', 'comments', 'follows')
+                }
+                for model, path in dumps.items():
+                    self.export(model, path, '--format', file_format)
+                Post.objects.all().delete()
+                Follow.objects.all().delete()
+                for model, path in dumps.items():
+                    self.load(
+                        model, path, '--format', file_format,
+                        '--batch-size', '2',
+                    )
+                self.assertEqual(Post.objects.count(), 5)
+                self.assertEqual(
+                    set(Post.objects.values_list('pub_date', flat=True)),
+                    {PUB_DATE},
+                )
+                self.assertEqual(
+                    set(Post.objects.values_list('comment_count', flat=True)),
+                    {1},
+                )
+                self.author.stats.refresh_from_db()
+                self.assertEqual(self.author.stats.posts_count, 5)
+                self.assertEqual(
+                    FeedItem.objects.filter(user=self.reader).count(), 5
+                )
+                response = Client().get(
+                    reverse('posts:search'), {'q': 'номер'}
+                )
+                self.assertEqual(len(response.context['page_obj']), 5)
+
+    def test_import_is_resumable(self):
+        """Повторная загрузка того же файла не создаёт дубликатов"""
+        path = self.path('again.jsonl')
+        self.export('posts', path)
+        self.load('posts', path)
+        self.assertEqual(Post.objects.count(), 5)
+
+    def test_export_resumes_after_interruption(self):
+        """Прерванная выгрузка дописывается с последней целой строки"""
+        path = self.path('partial.jsonl')
+        self.export('posts', path)
+        with open(path, encoding='utf-8') as stream:
+            lines = stream.readlines()
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.writelines(lines[:2])
+            stream.write(lines[2][:10])
+        self.export('posts', path, '--resume')
+        with open(path, encoding='utf-8') as stream:
+            ids = [json.loads(line)['id'] for line in stream]
+        self.assertEqual(
+            ids, list(Post.objects.order_by('pk').values_list('pk', flat=True))
+        )
+
+    def test_export_flushes_once_per_chunk(self):
+        stream = mock.Mock()
+        names = ['id', 'text']
+        rows = [{'id': i, 'text': 'Пост'} for i in range(5)]
+        self.assertEqual(
+            write_rows(rows, stream, names, 'jsonl', chunk_size=2), 5
+        )
+        self.assertEqual(stream.write.call_count, 5)
+        self.assertEqual(stream.flush.call_count, 3)
+
+    def test_import_bumps_once_per_batch(self):
+        """Пачка комментариев сдвигает поколения одним вызовом"""
+        rows = list(export_rows(Comment))
+        Comment.objects.all().delete()
+        with mock.patch('posts.transfer.bump') as bump:
+            import_rows(Comment, rows, batch_size=3)
+        self.assertEqual(bump.call_count, 2)
+        self.assertIn(f'group:{self.group.pk}', bump.call_args[0])
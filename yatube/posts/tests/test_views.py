@@ -3,6 +3,7 @@ from django.urls import reverse
 from django import forms
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
+from django.core.cache import cache
 from ..models import Post, Group, User
 import shutil
 import tempfile
@@ -49,6 +50,7 @@ class PostFormTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         # Создаем авторизованный клиент
         self.user = User.objects.create_user(username='AuthorizedUser')
         self.authorized_client = Client()
@@ -0,0 +1,177 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from .. import writebehind
+from ..models import Comment, FeedItem, Follow, Post, User
+from .test_fragment_cache import committed
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    POSTS_WRITE_BEHIND=True,
+    POSTS_WRITE_BEHIND_INTERVAL=0,
+    POSTS_WRITE_BEHIND_DIR=TEMP_DIR,
+)
+class WriteBehindTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.post = Post.objects.create(text='Текст поста', author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        writebehind._pending.clear()
+        self.addCleanup(writebehind._pending.clear)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+
+    def comment(self, text):
+        self.reader_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': text},
+        )
+
+    def follow(self, action='profile_follow'):
+        self.reader_client.get(
+            reverse(f'posts:{action}', kwargs={'username': self.author})
+        )
+
+    def test_comment_is_written_in_batch(self):
+        """Комментарий виден автору сразу, остальным -- после записи"""
+        self.comment('Отложенный комментарий')
+        self.assertFalse(Comment.objects.exists())
+        self.assertContains(
+            self.reader_client.get(self.detail_url), 'Отложенный комментарий'
+        )
+        self.assertNotContains(
+            self.client.get(self.detail_url), 'Отложенный комментарий'
+        )
+        with committed():
+            self.assertEqual(writebehind.flush(), 1)
+        self.assertTrue(Comment.objects.filter(
+            post=self.post, author=self.reader, text='Отложенный комментарий'
+        ).exists())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertContains(
+            self.client.get(self.detail_url), 'Отложенный комментарий'
+        )
+        self.assertEqual(
+            writebehind.pending_comments(self.reader, self.post.pk), []
+        )
+
+    def test_follow_is_written_in_batch(self):
+        """Подписка видна подписчику сразу, в базе -- после записи"""
+        profile_url = reverse(
+            'posts:profile', kwargs={'username': self.author}
+        )
+        self.follow()
+        self.assertFalse(Follow.objects.exists())
+        self.assertTrue(
+            self.reader_client.get(profile_url).context['following']
+        )
+        writebehind.flush()
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.author
+        ).exists())
+        self.assertTrue(FeedItem.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.author.stats.followers_count, 1)
+
+    def test_follow_and_unfollow_in_one_batch(self):
+        self.follow()
+        self.follow('profile_unfollow')
+        writebehind.flush()
+        self.assertFalse(Follow.objects.exists())
+
+    def test_batch_size_triggers_flush(self):
+        with self.settings(POSTS_WRITE_BEHIND_BATCH=2):
+            self.comment('Первый')
+            self.assertEqual(Comment.objects.count(), 0)
+            self.comment('Второй')
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_journal_is_synced_once_per_batch(self):
+        """Заявки не ждут fsync: журнал сбрасывается на диск пачкой"""
+        with mock.patch('os.fsync') as fsync:
+            for number in range(3):
+                self.comment(f'Комментарий {number}')
+            self.assertEqual(fsync.call_count, 0)
+            self.assertEqual(len(writebehind._read_journal(
+                writebehind._journal_path()
+            )), 3)
+            writebehind.flush()
+        self.assertLessEqual(fsync.call_count, 1)
+        self.assertEqual(Comment.objects.count(), 3)
+
+    def test_journal_survives_restart(self):
+        """Заявки упавшего процесса подхватываются из журнала"""
+        self.comment('Из журнала')
+        # Процесс «упал»: очередь потеряна, журнал остался на диске
+        writebehind._pending.clear()
+        os.replace(
+            writebehind._journal_path(),
+            writebehind._journal_path(pid=2 ** 22 + 1),
+        )
+        self.assertEqual(writebehind.recover(), 1)
+        writebehind.flush()
+        self.assertTrue(Comment.objects.filter(text='Из журнала').exists())
+        self.assertEqual(os.listdir(TEMP_DIR), [])
+
+    def test_replayed_batch_is_not_written_twice(self):
+        """Пачка, записанная до падения процесса, не дублируется
+        при повторе из журнала"""
+        self.comment('Однажды')
+        batch = list(writebehind._pending)
+        writebehind.flush()
+        # Процесс «упал» до перезаписи журнала: recover() вернёт пачку
+        writebehind._pending.extend(batch)
+        self.assertEqual(writebehind.flush(), 1)
+        self.assertEqual(Comment.objects.filter(text='Однажды').count(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+    def test_concurrent_submits_keep_all_pending(self):
+        """Одновременные заявки не затирают друг друга в кэше"""
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+        start = threading.Barrier(8)
+
+        def submit(number):
+            start.wait()
+            for i in range(5):
+                writebehind.submit_comment(
+                    self.reader, self.post, f'Комментарий {number}-{i}'
+                )
+
+        threads = [
+            threading.Thread(target=submit, args=(number,))
+            for number in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(
+            len(writebehind.pending_comments(self.reader, self.post.pk)), 40
+        )
@@ -0,0 +1,227 @@
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils.functional import SimpleLazyObject
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import EXTENSIONS
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDBKVStore,
+)
+from sorl.thumbnail.models import KVStore
+
+from core.budgets import exempt_from_budget
+
+from .models import Post
+from .versions import bump_post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_jobs = set()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_PREGENERATE_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def generate_thumbnails(image):
+    """Строит все миниатюры из POSTS_THUMBNAILS для изображения поста."""
+    for geometry, options in settings.POSTS_THUMBNAILS:
+        get_thumbnail(image, geometry, **options)
+
+
+def variant_formats():
+    """Форматы вариантов, которые умеют сохранять Pillow и sorl."""
+    Image.init()
+    return [
+        image_format for image_format in settings.POSTS_IMAGE_VARIANT_FORMATS
+        if image_format in Image.SAVE and image_format in EXTENSIONS
+    ]
+
+
+def build_variants(image):
+    """Строит уменьшенные копии изображения под srcset и возвращает их
+    описание: имя файла, ширину и MIME-тип."""
+    geometry, options = settings.POSTS_THUMBNAILS[0]
+    width, height = (int(size) for size in geometry.split('x'))
+    variants = []
+    for image_format in variant_formats():
+        for variant_width in settings.POSTS_IMAGE_VARIANT_WIDTHS:
+            variant = get_thumbnail(
+                image,
+                f'{variant_width}x{round(height * variant_width / width)}',
+                **{**options, 'format': image_format},
+            )
+            variants.append({
+                'name': variant.name,
+                'width': variant_width,
+                'type': Image.MIME[image_format],
+            })
+    return variants
+
+
+def process_post_image(post):
+    """Готовит миниатюры и варианты изображения поста и сохраняет
+    описание вариантов в посте."""
+    generate_thumbnails(post.image)
+    post.image_variants = json.dumps(build_variants(post.image))
+    Post.objects.filter(pk=post.pk, image=post.image.name).update(
+        image_variants=post.image_variants
+    )
+    bump_post(post.pk, post.author_id, post.group_id)
+
+
+def _process_in_worker(post):
+    try:
+        process_post_image(post)
+    except Exception:
+        logger.exception(
+            'Не удалось подготовить изображение %s', post.image.name
+        )
+    finally:
+        connections.close_all()
+
+
+def pregenerate_thumbnails(post):
+    """Ставит подготовку изображения поста в фоновый пул после фиксации
+    транзакции, чтобы шаблоны брали готовые файлы. При
+    THUMBNAIL_PREGENERATE_WORKERS = 0 всё делается сразу, в текущем потоке."""
+    if not post.image:
+        return
+    if not settings.THUMBNAIL_PREGENERATE_WORKERS:
+        process_post_image(post)
+        return
+    transaction.on_commit(partial(_submit, post))
+
+
+def _submit(post):
+    job = _get_executor().submit(_process_in_worker, post)
+    _jobs.add(job)
+    job.add_done_callback(_jobs.discard)
+
+
+def wait_for_jobs(timeout=None):
+    """Ждёт фоновые задания, поставленные к этому моменту."""
+    wait(list(_jobs), timeout)
+
+
+def pregenerate_all(posts):
+    """Готовит изображения всех постов и ждёт окончания работы пула."""
+    posts = [post for post in posts if post.image]
+    if not settings.THUMBNAIL_PREGENERATE_WORKERS:
+        for post in posts:
+            process_post_image(post)
+    else:
+        list(_get_executor().map(_process_in_worker, posts))
+    return len(posts)
+
+
+def _thumbnail_file(image, geometry, options):
+    """Имя миниатюры без обращения к хранилищу: повторяет подготовку
+    опций из ThumbnailBackend.get_thumbnail."""
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def _lookup_many(raw_keys):
+    """Читает записи key-value хранилища sorl: сначала одним get_many
+    из кэша, затем промахи одним запросом к таблице thumbnail_kvstore."""
+    kv_cache = default.kvstore.cache
+    found = kv_cache.get_many(raw_keys)
+    missing = [key for key in raw_keys if key not in found]
+    if missing:
+        stored = dict(
+            KVStore.objects.filter(key__in=missing).values_list('key', 'value')
+        )
+        kv_cache.set_many(
+            {key: stored.get(key, EMPTY_VALUE) for key in missing},
+            sorl_settings.THUMBNAIL_CACHE_TIMEOUT,
+        )
+        found.update(stored)
+    return {
+        key: deserialize_image_file(value)
+        for key, value in found.items()
+        if value and value != EMPTY_VALUE
+    }
+
+
+def resolve_thumbnails(images, geometry=None, options=None):
+    """Возвращает словарь {имя изображения: миниатюра} для всех images.
+
+    По умолчанию берётся первая геометрия из POSTS_THUMBNAILS. Готовые
+    миниатюры находятся пакетно, недостающие строятся на месте.
+    """
+    if geometry is None:
+        geometry, options = settings.POSTS_THUMBNAILS[0]
+    images = {image.name: image for image in images if image}
+    if not isinstance(default.kvstore, CachedDBKVStore):
+        return {
+            name: get_thumbnail(image, geometry, **options)
+            for name, image in images.items()
+        }
+    files = {
+        name: _thumbnail_file(image, geometry, options)
+        for name, image in images.items()
+    }
+    found = _lookup_many([add_prefix(file.key) for file in files.values()])
+    thumbnails = {}
+    for name, file in files.items():
+        thumbnail = found.get(add_prefix(file.key))
+        if thumbnail is None:
+            with exempt_from_budget():
+                thumbnail = get_thumbnail(images[name], geometry, **options)
+        thumbnails[name] = thumbnail
+    return thumbnails
+
+
+class ThumbnailBatch:
+    """Миниатюры группы постов, которые разрешаются все сразу при первом
+    обращении шаблона. Если фрагмент взят из кэша, поиска нет вовсе."""
+
+    def __init__(self, posts):
+        self.posts = [post for post in posts if post.image]
+        self._thumbnails = None
+
+    def get(self, post):
+        if self._thumbnails is None:
+            self._thumbnails = resolve_thumbnails(
+                [post.image for post in self.posts]
+            )
+        return self._thumbnails.get(post.image.name)
+
+
+def attach_thumbnails(posts):
+    """Проставляет постам атрибут thumbnail для шаблонов."""
+    batch = ThumbnailBatch(posts)
+    for post in batch.posts:
+        post.thumbnail = SimpleLazyObject(partial(batch.get, post))
+    return posts
@@ -0,0 +1,195 @@
+import csv
+import json
+from contextlib import contextmanager
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .counters import reconcile_comment_counts, reconcile_user_stats
+from .feed import rebuild_feeds
+from .models import Comment, Follow, Group, Post
+from .search import rebuild_index
+from .versions import bump, post_scopes
+
+MODELS = {
+    'groups': Group,
+    'posts': Post,
+    'comments': Comment,
+    'follows': Follow,
+}
+# Денормализованные поля не переносятся, а пересчитываются после загрузки
+DERIVED_FIELDS = {'comment_count', 'image_variants'}
+FORMATS = ('jsonl', 'csv')
+
+
+def transfer_fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if field.name not in DERIVED_FIELDS
+    ]
+
+
+def export_rows(model, after=None, chunk_size=2000):
+    """Строки модели по возрастанию pk, начиная после after. Читаются
+    курсором базы по chunk_size, без загрузки всей таблицы в память."""
+    names = [field.attname for field in transfer_fields(model)]
+    queryset = model.objects.order_by('pk').values_list(*names)
+    if after is not None:
+        queryset = queryset.filter(pk__gt=after)
+    for values in queryset.iterator(chunk_size=chunk_size):
+        yield dict(zip(names, values))
+
+
+def write_rows(rows, stream, names, file_format, header=True,
+               chunk_size=2000):
+    """Пишет строки в поток, сбрасывая буфер после каждых chunk_size
+    строк. Прерванную выгрузку можно продолжить с последней целой
+    строки: недописанную prepare_resume отрежет."""
+    count = 0
+    if file_format == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=names)
+        if header:
+            writer.writeheader()
+    for row in rows:
+        if file_format == 'csv':
+            writer.writerow(row)
+        else:
+            stream.write(json.dumps(
+                row, cls=DjangoJSONEncoder, ensure_ascii=False
+            ) + '\n')
+        count += 1
+        if count % chunk_size == 0:
+            stream.flush()
+    stream.flush()
+    return count
+
+
+def read_rows(stream, file_format):
+    if file_format == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _trim_partial_line(path):
+    """Отрезает недописанную последнюю строку прерванной выгрузки."""
+    with open(path, 'rb+') as stream:
+        size = stream.seek(0, 2)
+        position = size
+        while position > 0:
+            step = min(4096, position)
+            position -= step
+            stream.seek(position)
+            tail = stream.read(step)
+            newline = tail.rfind(b'\n')
+            if newline != -1:
+                position += newline + 1
+                break
+        if position != size:
+            stream.truncate(position)
+
+
+def prepare_resume(path, file_format):
+    """Готовит файл к дозаписи и возвращает pk последней строки в нём."""
+    try:
+        _trim_partial_line(path)
+    except FileNotFoundError:
+        return None
+    last = None
+    with open(path, newline='', encoding='utf-8') as stream:
+        for row in read_rows(stream, file_format):
+            last = row
+    return last and int(last['id'])
+
+
+@contextmanager
+def keep_auto_now_add(model):
+    """Сохраняет даты из файла: auto_now_add в bulk_create их перезаписал
+    бы текущим временем."""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _build(model, fields, row):
+    values = {}
+    for field in fields:
+        value = row.get(field.attname)
+        if value == '' and field.null:
+            value = None
+        if value is None and getattr(field, 'auto_now_add', False):
+            value = timezone.now()
+        if value is not None or field.null:
+            values[field.attname] = field.to_python(value)
+    return model(**values)
+
+
+def _scopes(model, objs):
+    if model is Group:
+        return {'all', *(f'group:{obj.pk}' for obj in objs)}
+    if model is Post:
+        posts = ((obj.pk, obj.author_id, obj.group_id) for obj in objs)
+    elif model is Comment:
+        posts = Post.objects.filter(
+            pk__in={obj.post_id for obj in objs}
+        ).values_list('pk', 'author_id', 'group_id')
+    else:
+        return {
+            f'{scope}:{user_id}'
+            for obj in objs for user_id in (obj.user_id, obj.author_id)
+            for scope in ('author', 'profile')
+        }
+    return {scope for post in posts for scope in post_scopes(*post)}
+
+
+def _invalidate(model, objs):
+    """Сдвигает поколения фрагментов, которые показывают загруженное,
+    одним bump на пачку."""
+    bump(*_scopes(model, objs))
+
+
+def import_rows(model, rows, batch_size=1000):
+    """Загружает строки пачками bulk_create, каждая пачка -- в своей
+    транзакции. Уже загруженные pk пропускаются, поэтому прерванную
+    загрузку можно просто запустить заново."""
+    fields = transfer_fields(model)
+    rows = iter(rows)
+    count = 0
+    with keep_auto_now_add(model):
+        while True:
+            objs = [
+                _build(model, fields, row)
+                for row in islice(rows, batch_size)
+            ]
+            if not objs:
+                return count
+            with transaction.atomic():
+                model.objects.bulk_create(objs, ignore_conflicts=True)
+            _invalidate(model, objs)
+            count += len(objs)
+
+
+def refresh_derived_data(model):
+    """Восстанавливает то, что при записи поддерживают сигналы:
+    счётчики, ленты подписок и поисковый индекс. Каждый шаг -- отдельный
+    запрос в своей транзакции, чтобы не держать блокировку записи на всю
+    перестройку; шаги можно повторять."""
+    reconcile_comment_counts()
+    reconcile_user_stats()
+    if model in (Post, Follow):
+        rebuild_feeds()
+    if model is Post:
+        with transaction.atomic():
+            rebuild_index()
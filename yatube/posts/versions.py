@@ -0,0 +1,102 @@
+import time
+from datetime import datetime, timezone
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.routers import may_cache, pinned
+
+KEY = 'posts:version:{}'
+CHANGED_KEY = 'posts:changed:{}'
+
+
+def _initial():
+    # Счётчик, вытесненный из кэша, начинается заново с текущего времени,
+    # поэтому старые версии фрагментов не могут совпасть с новыми.
+    return time.time_ns() // 1000
+
+
+def get_versions(*scopes):
+    """Текущие поколения областей одной строкой для ключа фрагмента."""
+    keys = [KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial(), None)
+            versions[key] = cache.get(key)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def bump(*scopes):
+    """Сдвигает поколения областей: закэшированные фрагменты устаревают.
+
+    Сдвиг откладывается до фиксации текущей транзакции: иначе читатель
+    успел бы собрать старые данные и положить их под новым поколением.
+    Вне транзакции поколения сдвигаются сразу."""
+    transaction.on_commit(partial(_bump, scopes))
+
+
+def _bump(scopes):
+    for scope in scopes:
+        key = KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial(), None)
+    now = time.time()
+    cache.set_many(
+        {CHANGED_KEY.format(scope): now for scope in scopes}, None
+    )
+
+
+def changed_at(*scopes):
+    """Время последнего сдвига поколений областей. Если отметка
+    вытеснена из кэша, изменение считается только что случившимся."""
+    keys = [CHANGED_KEY.format(scope) for scope in scopes]
+    stamps = cache.get_many(keys)
+    for key in keys:
+        if key not in stamps:
+            cache.add(key, time.time(), None)
+            stamps[key] = cache.get(key) or time.time()
+    return datetime.fromtimestamp(max(stamps.values()), timezone.utc)
+
+
+def post_scopes(post_id, author_id, *group_ids):
+    """Области, в которых показывается пост."""
+    return (
+        'all',
+        f'post:{post_id}',
+        f'author:{author_id}',
+        *(f'group:{group_id}' for group_id in group_ids if group_id),
+    )
+
+
+def bump_post(post_id, author_id, *group_ids):
+    bump(*post_scopes(post_id, author_id, *group_ids))
+
+
+def cacheable(*scopes):
+    """Можно ли сохранить в общий кэш собранное в запросе под текущими
+    поколениями областей (см. core.routers.may_cache)."""
+    return may_cache(changed_at(*scopes))
+
+
+def cache_policy(*scopes):
+    """Контекст для {% shared_cache %}: клиент, закреплённый за основной
+    базой, пересобирает фрагменты, а чтение с отстающей реплики их
+    не сохраняет."""
+    return {
+        'cache_refresh': pinned(),
+        'cache_store': cacheable(*scopes),
+    }
+
+
+def fragment_cache(*scopes):
+    """Контекст для {% shared_cache cache_timeout имя ... cache_version %}."""
+    return {
+        'cache_timeout': settings.POSTS_FRAGMENT_CACHE_TIMEOUT,
+        'cache_version': get_versions(*scopes),
+        **cache_policy(*scopes),
+    }
@@ -1,89 +1,172 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
+
+from django.http import JsonResponse
+
 from django.shortcuts import render, get_object_or_404, redirect
 
-from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+
+from django.views.decorators.http import require_POST
 
 from django.contrib.auth.decorators import login_required
 
-from django.conf import settings
+from django.db import transaction
+
+from django.db.models import Q
+
+from core.budgets import query_budget
+
+from core.routers import pin_to_primary, read_from_replicas
+
+from .models import Post, Group, User, Follow
 
-from .models import Post, Group, User, Comment, Follow
+from .follows import follow_authors, unfollow_authors
 
 from .forms import PostForm, CommentForm
 
+from .pagecache import anonymous_page_cache, page_depends_on
+
+from .paginators import CursorPaginator, paginate
+
+from .bundles import bundle_scopes, get_comment_page, get_post_bundle
+
+from .conditional import (
+    conditional_page, group_stamps, index_stamps, post_stamps, profile_stamps
+)
+
+from .counters import get_stats
+
+from .search import search_posts
+
+from .versions import cache_policy, fragment_cache
+
+from .thumbnails import attach_thumbnails, pregenerate_thumbnails
+
+from . import writebehind
+
 
+@query_budget(6)
+@read_from_replicas
+@anonymous_page_cache
+@conditional_page(index_stamps)
 def index(request):
     template = 'posts/index.html'
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.for_listing()
+    page_obj = paginate(request, post_list)
+    attach_thumbnails(page_obj)
     context = {
         'page_obj': page_obj,
+        **fragment_cache('all'),
     }
     return render(request, template, context)
 
 
+@query_budget(8)
+@read_from_replicas
+@anonymous_page_cache
+@conditional_page(group_stamps)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    post_list = Post.objects.filter(group=group)
-    paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.for_listing().filter(group=group)
+    page_obj = paginate(request, post_list)
+    attach_thumbnails(page_obj)
 
     context = {
         'group': group,
         'page_obj': page_obj,
+        **fragment_cache(f'group:{group.pk}'),
     }
     return render(request, template, context)
 
 
+@query_budget(9)
+@read_from_replicas
+@anonymous_page_cache
+@conditional_page(profile_stamps)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    page_depends_on(request, f'profile:{author.pk}')
     is_author = author == request.user
-    posts_list = Post.objects.filter(author=author)
-    paginator = Paginator(posts_list, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    posts_count = posts_list.count()
-    following = request.user.is_authenticated and Follow.objects.filter(
-        user=request.user, author=author
-    ).exists()
+    stats = get_stats(author)
+    posts_list = Post.objects.for_listing().filter(author=author)
+    page_obj = paginate(request, posts_list)
+    attach_thumbnails(page_obj)
+    following = writebehind.pending_follow(request.user, author.pk)
+    if following is None:
+        following = request.user.is_authenticated and Follow.objects.filter(
+            user=request.user, author=author
+        ).exists()
     context = {
         'posts_list': posts_list,
         'page_obj': page_obj,
-        'posts_count': posts_count,
+        'posts_count': stats.posts_count,
+        'followers_count': stats.followers_count,
+        'following_count': stats.following_count,
         'author': author,
         'is_author': is_author,
         'following': following,
+        **fragment_cache(f'author:{author.pk}'),
     }
     return render(request, template, context)
 
 
+@query_budget(5)
+@read_from_replicas
+@conditional_page(post_stamps)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = Post.objects.get(pk=post_id)
-    posts_count = Post.objects.filter(author=post.author).count()
-    user_posts_link = 'profile/' + post.author.username
-    is_author = post.author == request.user
-    comment_form = CommentForm()
-    comments = Comment.objects.filter(post=post)
+    bundle = get_post_bundle(post_id)
+    post = bundle['post']
+    attach_thumbnails([post])
     context = {
         'post': post,
-        'posts_count': posts_count,
-        'user_posts_link': user_posts_link,
+        'posts_count': bundle['posts_count'],
+        'user_posts_link': 'profile/' + post.author.username,
         'post_id': post_id,
-        'is_author': is_author,
-        'comment_form': comment_form,
-        'comments': comments,
+        'is_author': post.author == request.user,
+        'comment_form': CommentForm(),
+        'comments': bundle['comments'],
+        'pending_comments': writebehind.pending_comments(
+            request.user, post_id
+        ),
+        'comments_next_cursor': bundle['comments_next_cursor'],
+        'cache_timeout': settings.POSTS_FRAGMENT_CACHE_TIMEOUT,
+        'cache_version': bundle['versions'],
+        **cache_policy(*bundle_scopes(bundle)),
+    }
+    return render(request, template, context)
+
+
+@query_budget(4)
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    post_list = search_posts(query, Post.objects.for_listing())
+    paginator = CursorPaginator(
+        post_list, settings.POSTS_PER_PAGE, ordering=('search_rank', '-pk')
+    )
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    attach_thumbnails(page_obj)
+    context = {
+        'query': query,
+        'query_string': urlencode({'q': query}) + '&',
+        'page_obj': page_obj,
     }
     return render(request, template, context)
 
 
+@query_budget(12)
+@pin_to_primary
 @login_required
+@transaction.atomic
 def post_create(request):
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     template = 'posts/create_post.html'
     context = {
         'form': form
@@ -92,11 +175,15 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        pregenerate_thumbnails(post)
         return redirect('posts:profile', request.user)
     return render(request, template, context)
 
 
+@query_budget(10)
+@pin_to_primary
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     if post.author != request.user:
@@ -113,16 +200,28 @@ def post_edit(request, post_id):
         'post_id': post_id,
     }
     if form.is_valid():
-        form.save()
+        image_changed = 'image' in form.changed_data
+        if image_changed:
+            post.image_variants = ''
+        post = form.save()
+        if image_changed:
+            pregenerate_thumbnails(post)
         return redirect('posts:post_detail', post_id)
     return render(request, template, context)
 
 
+@query_budget(7)
+@pin_to_primary
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
-    if form.is_valid():
+    if form.is_valid() and settings.POSTS_WRITE_BEHIND:
+        writebehind.submit_comment(
+            request.user, post, form.cleaned_data['text']
+        )
+    elif form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
@@ -130,36 +229,73 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(3)
+@read_from_replicas
+def comments(request, post_id):
+    page_obj = get_comment_page(post_id, request.GET.get('cursor'))
+    html = render_to_string(
+        'posts/includes/comment_list.html', {'comments': page_obj}, request
+    )
+    return JsonResponse({'html': html, 'next_cursor': page_obj.next_cursor})
+
+
+@query_budget(5)
+@read_from_replicas
 @login_required
 def follow_index(request):
-    post_list = Post.objects.none()
-    if Follow.objects.filter(user=request.user).exists():
-        subscriptions = Follow.objects.filter(user=request.user)
-        for subscription in subscriptions:
-            post_list = post_list | Post.objects.filter(
-                author=subscription.author
-            )
-    paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.for_listing().order_by(
+        '-feed_items__pub_date'
+    )
+    page_obj = paginate(
+        request,
+        post_list,
+        ordering=('-feed_items__pub_date', '-feed_items__post'),
+        where=Q(feed_items__user=request.user),
+    )
+    attach_thumbnails(page_obj)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/follow.html', context)
 
 
+@query_budget(12)
+@pin_to_primary
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
-    author = User.objects.filter(username=username)[0]
-    if not Follow.objects.filter(
-        user=request.user, author=author
-    ).exists() and author != request.user:
-        Follow.objects.create(user=request.user, author=author)
-    return redirect('posts:profile', author)
+    if settings.POSTS_WRITE_BEHIND:
+        author = get_object_or_404(User, username=username)
+        if author != request.user:
+            writebehind.submit_follow(request.user, author)
+    else:
+        follow_authors(request.user, User.objects.filter(username=username))
+    return redirect('posts:profile', username)
 
 
+@query_budget(9)
+@pin_to_primary
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
-    author = User.objects.filter(username=username)[0]
-    Follow.objects.filter(user=request.user, author=author).delete()
-    return redirect('posts:profile', author)
+    if settings.POSTS_WRITE_BEHIND:
+        author = get_object_or_404(User, username=username)
+        writebehind.submit_follow(request.user, author, follow=False)
+    else:
+        unfollow_authors(
+            request.user, User.objects.filter(username=username)
+        )
+    return redirect('posts:profile', username)
+
+
+@query_budget(12)
+@pin_to_primary
+@require_POST
+@login_required
+@transaction.atomic
+def follow_many(request):
+    followed = follow_authors(
+        request.user,
+        User.objects.filter(username__in=request.POST.getlist('username')),
+    )
+    return JsonResponse({'followed': followed})
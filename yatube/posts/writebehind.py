@@ -0,0 +1,304 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+
+from core.cache import locked
+
+from .counters import change_comment_count
+from .follows import follow_authors, unfollow_authors
+from .models import Comment, Post, User
+from .versions import bump, bump_post
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'posts:pending:{}'
+
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_pending = []
+_flusher = None
+
+
+def _journal_path(pid=None):
+    return os.path.join(
+        settings.POSTS_WRITE_BEHIND_DIR, f'{pid or os.getpid()}.jsonl'
+    )
+
+
+def _write_journal(entries):
+    path = _journal_path()
+    if not entries:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    os.makedirs(settings.POSTS_WRITE_BEHIND_DIR, exist_ok=True)
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as journal:
+        for entry in entries:
+            journal.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        journal.flush()
+        os.fsync(journal.fileno())
+    os.replace(temporary, path)
+
+
+def _append_journal(entry):
+    # Без fsync: строка попадает в кэш ОС и переживает падение процесса.
+    # На диск журнал сбрасывается раз в пачку (flush, _sync_journal),
+    # так что при сбое самой ОС теряются заявки за последний интервал
+    os.makedirs(settings.POSTS_WRITE_BEHIND_DIR, exist_ok=True)
+    with open(_journal_path(), 'a', encoding='utf-8') as journal:
+        journal.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+
+def _sync_journal():
+    try:
+        with open(_journal_path(), 'rb') as journal:
+            os.fsync(journal.fileno())
+    except FileNotFoundError:
+        pass
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read_journal(path):
+    entries = []
+    with open(path, encoding='utf-8') as journal:
+        for line in journal:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # Строка, недописанная при падении процесса
+                continue
+    return entries
+
+
+def recover():
+    """Забирает журналы завершившихся процессов в очередь текущего.
+    Возвращает число подхваченных записей."""
+    directory = settings.POSTS_WRITE_BEHIND_DIR
+    if not os.path.isdir(directory):
+        return 0
+    recovered = []
+    for name in sorted(os.listdir(directory)):
+        pid, _, extension = name.partition('.')
+        if (
+            extension != 'jsonl' or not pid.isdigit()
+            or int(pid) == os.getpid() or _alive(int(pid))
+        ):
+            continue
+        path = os.path.join(directory, name)
+        entries = _read_journal(path)
+        with _lock:
+            _pending.extend(entries)
+            _write_journal(_pending)
+        os.remove(path)
+        recovered.extend(entries)
+    return len(recovered)
+
+
+def _start_flusher():
+    global _flusher
+    if _flusher is not None or not settings.POSTS_WRITE_BEHIND_INTERVAL:
+        return
+    _flusher = threading.Thread(
+        target=_flush_forever, name='posts-write-behind', daemon=True
+    )
+    _flusher.start()
+    recover()
+
+
+def _flush_forever():
+    while True:
+        time.sleep(settings.POSTS_WRITE_BEHIND_INTERVAL)
+        close_old_connections()
+        try:
+            flush()
+        except Exception:
+            logger.exception('Не удалось записать отложенную пачку')
+            with _lock:
+                _sync_journal()
+
+
+def _submit(user, **entry):
+    entry.update(
+        id=uuid.uuid4().hex, user_id=user.pk, submitted=time.time()
+    )
+    with _lock:
+        _append_journal(entry)
+        _pending.append(entry)
+        size = len(_pending)
+    key = PENDING_KEY.format(user.pk)
+    with locked(key):
+        cache.set(key, [*(cache.get(key) or []), entry], None)
+    _start_flusher()
+    if size >= settings.POSTS_WRITE_BEHIND_BATCH:
+        flush()
+
+
+def submit_comment(user, post, text):
+    """Ставит комментарий в очередь; автор видит его сразу
+    (pending_comments), остальные -- после записи пачки."""
+    _submit(user, kind='comment', post_id=post.pk, text=text)
+    bump_post(post.pk, post.author_id, post.group_id)
+
+
+def submit_follow(user, author, follow=True):
+    _submit(
+        user, kind='follow' if follow else 'unfollow', author_id=author.pk
+    )
+    bump(f'profile:{user.pk}', f'profile:{author.pk}')
+
+
+def _pending_for(user):
+    if not settings.POSTS_WRITE_BEHIND or not user.is_authenticated:
+        return []
+    return cache.get(PENDING_KEY.format(user.pk)) or []
+
+
+def pending_comments(user, post_id):
+    """Ещё не записанные комментарии пользователя к посту, новые первыми."""
+    return [
+        Comment(
+            post_id=post_id,
+            author=user,
+            text=entry['text'],
+            created=datetime.fromtimestamp(entry['submitted'], timezone.utc),
+        )
+        for entry in reversed(_pending_for(user))
+        if entry['kind'] == 'comment' and entry['post_id'] == post_id
+    ]
+
+
+def pending_follow(user, author_id):
+    """Подписка по последней незаписанной заявке или None, если
+    заявок нет."""
+    state = None
+    for entry in _pending_for(user):
+        if entry['kind'] in ('follow', 'unfollow') and (
+            entry['author_id'] == author_id
+        ):
+            state = entry['kind'] == 'follow'
+    return state
+
+
+def _save_comments(entries):
+    posts = {
+        post_id: (author_id, group_id)
+        for post_id, author_id, group_id in Post.objects.filter(
+            pk__in={entry['post_id'] for entry in entries}
+        ).values_list('pk', 'author_id', 'group_id')
+    }
+    users = set(User.objects.filter(
+        pk__in={entry['user_id'] for entry in entries}
+    ).values_list('pk', flat=True))
+    written = set(Comment.objects.filter(
+        writebehind_id__in=[entry['id'] for entry in entries]
+    ).values_list('writebehind_id', flat=True))
+    comments = [
+        Comment(
+            post_id=entry['post_id'],
+            author_id=entry['user_id'],
+            text=entry['text'],
+            writebehind_id=entry['id'],
+        )
+        for entry in entries
+        if entry['post_id'] in posts and entry['user_id'] in users
+        and entry['id'] not in written
+    ]
+    # bulk_create не шлёт сигналы: счётчики и версии -- пачкой по постам
+    Comment.objects.bulk_create(comments)
+    for post_id, count in Counter(c.post_id for c in comments).items():
+        change_comment_count(post_id, count)
+        bump_post(post_id, *posts[post_id])
+
+
+def _save_follows(entries):
+    # Из нескольких заявок на одну пару действует последняя
+    wanted = {}
+    for entry in entries:
+        wanted[entry['user_id'], entry['author_id']] = (
+            entry['kind'] == 'follow'
+        )
+    changes = defaultdict(lambda: ([], []))
+    for (user_id, author_id), follow in wanted.items():
+        changes[user_id][0 if follow else 1].append(author_id)
+    users = User.objects.in_bulk(list(changes))
+    for user_id, (followed, unfollowed) in changes.items():
+        if user_id not in users:
+            continue
+        if followed:
+            follow_authors(
+                users[user_id], User.objects.filter(pk__in=followed)
+            )
+        if unfollowed:
+            unfollow_authors(
+                users[user_id], User.objects.filter(pk__in=unfollowed)
+            )
+
+
+def _forget(entries):
+    flushed = {entry['id'] for entry in entries}
+    for user_id in {entry['user_id'] for entry in entries}:
+        key = PENDING_KEY.format(user_id)
+        with locked(key):
+            remaining = [
+                entry for entry in cache.get(key) or []
+                if entry['id'] not in flushed
+            ]
+            if remaining:
+                cache.set(key, remaining, None)
+            else:
+                cache.delete(key)
+
+
+def flush():
+    """Записывает накопленные комментарии и подписки одной транзакцией.
+    Возвращает число записанных заявок. При ошибке заявки остаются
+    в очереди и журнале до следующей попытки.
+
+    Если процесс упадёт между фиксацией и перезаписью журнала, recover()
+    вернёт пачку в очередь целиком. Повтор безопасен: комментарии
+    с уже записанным writebehind_id пропускаются, а подписки задают
+    состояние, а не меняют его."""
+    with _flush_lock:
+        with _lock:
+            batch = list(_pending)
+        if not batch:
+            return 0
+        with transaction.atomic():
+            _save_comments([e for e in batch if e['kind'] == 'comment'])
+            _save_follows([e for e in batch if e['kind'] != 'comment'])
+        with _lock:
+            del _pending[:len(batch)]
+            _write_journal(_pending)
+        _forget(batch)
+        return len(batch)
+
+
+@atexit.register
+def _flush_on_exit():
+    if not _pending:
+        return
+    try:
+        flush()
+    except Exception:
+        # Заявки остались в журнале: их подхватит recover()
+        logger.exception('Отложенные записи не сохранены при остановке')
@@ -0,0 +1,39 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+
+import django
+from django.core.exceptions import ImproperlyConfigured
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+# ASGI-обработчик появился в Django 3.0, асинхронные представления --
+# в 3.1, асинхронные запросы ORM -- в 4.1. Проект закреплён на 2.2
+# (requirements.txt, tests/conftest.py), поэтому до обновления сервер
+# ASGI не запустится. Порядок обновления:
+#   1. Django 3.2 LTS и asgiref, совместимые sorl-thumbnail
+#      и django-debug-toolbar; снять ограничение в tests/conftest.py.
+#   2. Перевести thread-local состояние core.instrumentation,
+#      core.budgets и core.routers на contextvars: под ASGI запрос
+#      не привязан к одному потоку.
+#   3. Сделать index, group_posts, profile и post_detail асинхронными:
+#      независимые чтения (счётчики автора, подписка, страница
+#      комментариев, версии фрагментов) -- через asyncio.gather
+#      и sync_to_async, пока ORM синхронный.
+#   4. Сравнить с WSGI: manage.py benchmark_views под тем же набором
+#      данных, сервер -- uvicorn против gunicorn.
+if django.VERSION < (3, 0):
+    raise ImproperlyConfigured(
+        f'ASGI требует Django 3.0+, установлен {django.get_version()}'
+    )
+
+from django.core.asgi import get_asgi_application  # noqa: E402
+
+application = get_asgi_application()
@@ -39,7 +39,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.staticfiles.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -79,9 +81,47 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение живёт между запросами, а не открывается заново
+        'CONN_MAX_AGE': 60,
+        # Сколько секунд ждать чужую блокировку записи
+        'OPTIONS': {'timeout': 20},
     }
 }
 
+# PRAGMA для каждого нового соединения SQLite (core.sqlite): WAL даёт
+# читать во время записи, synchronous=NORMAL в WAL не теряет
+# согласованность при сбое процесса. cache_size отрицательный -- в КиБ.
+# Сравнение с настройками по умолчанию: manage.py benchmark_sqlite
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'busy_timeout': 20000,
+}
+
+# Реплики только для чтения: файлы баз через запятую в DATABASE_REPLICAS.
+# Локально их заменяют копии основной базы (manage.py sync_replicas).
+# В тестах реплики -- зеркала основной базы.
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+    filter(None, os.environ.get('DATABASE_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Приложения, чьи модели читаются с реплик (сессии и пользователи --
+# всегда с основной базы)
+DATABASE_REPLICA_APPS = ['posts']
+# Сколько секунд после записи клиент читает с основной базы, а данные
+# с реплик не кладутся в общие кэши (core.routers.may_cache)
+REPLICA_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -121,6 +161,14 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# Без DEBUG collectstatic добавляет в имена файлов хэш содержимого
+# и кладёт рядом сжатые копии; core.staticfiles.StaticFilesMiddleware
+# раздаёт их с вечным кэшированием
+if not DEBUG:
+    STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+# Сколько секунд кэшировать статику без хэша в имени
+STATIC_FALLBACK_MAX_AGE = 60 * 60
 
 
 LOGIN_URL = 'users:login'
@@ -139,11 +187,38 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 
+# LocMemCache живёт в памяти одного процесса. Под gunicorn с несколькими
+# воркерами нужен общий бэкенд, например:
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# CACHE_LOCATION=/var/tmp/yatube_cache
+# или memcached (django.core.cache.backends.memcached.MemcachedCache,
+# CACHE_LOCATION=127.0.0.1:11211).
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
+# Бэкенды, которые не видят записи других процессов. Сдвиг поколения
+# (posts.versions) в одном воркере не сбрасывает кэш остальных, поэтому
+# с ними кэш живёт не дольше PROCESS_LOCAL_CACHE_MAX_TIMEOUT секунд,
+# а отложенная запись недоступна (проверки core.E001, core.E002)
+PROCESS_LOCAL_CACHE_BACKENDS = [
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+]
+PROCESS_LOCAL_CACHE_MAX_TIMEOUT = 20
+SHARED_CACHE = (
+    CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHE_BACKENDS
+)
+
+# core.cache.get_or_compute: сколько секунд после истечения отдавать
+# устаревшее значение, пока один запрос его пересчитывает, и сколько
+# ждать чужого пересчёта при промахе
+CACHE_STALE_TTL = 60
+CACHE_LOCK_TIMEOUT = 10
 
 
 INTERNAL_IPS = [
@@ -153,4 +228,61 @@ INTERNAL_IPS = [
 
 THUMBNAIL_PRESERVE_FORMAT = True
 
+# Миниатюры, которые строятся заранее при загрузке изображения поста.
+# Первая из них выводится в лентах и на странице поста.
+POSTS_THUMBNAILS = [
+    ('960x339', {'crop': 'center', 'upscale': True}),
+]
+# Размер фонового пула; 0 -- строить миниатюры сразу в запросе
+THUMBNAIL_PREGENERATE_WORKERS = 2
+# Ширины и форматы адаптивных копий изображения для srcset;
+# форматы, которые не умеет сохранять Pillow (например AVIF без
+# плагина), пропускаются
+POSTS_IMAGE_VARIANT_WIDTHS = [480, 960, 1440]
+POSTS_IMAGE_VARIANT_FORMATS = ['AVIF', 'WEBP']
+
 POSTS_PER_PAGE = 10
+# Сколько последних комментариев показывать на странице поста
+POSTS_COMMENTS_PER_PAGE = 20
+
+# Keyset-паджинация (?cursor=...) вместо нумерованных страниц (?page=N)
+POSTS_KEYSET_PAGINATION = False
+
+# Фрагменты лент и постов сбрасываются по версиям (posts.versions),
+# поэтому в общем кэше их можно хранить долго
+POSTS_FRAGMENT_CACHE_TIMEOUT = (
+    60 * 60 * 24 if SHARED_CACHE else PROCESS_LOCAL_CACHE_MAX_TIMEOUT
+)
+# Ленты и профили для анонимов (без сессионной куки) кэшируются целиком
+# и тоже сбрасываются по версиям; 0 -- не кэшировать
+POSTS_ANONYMOUS_PAGE_CACHE_TIMEOUT = (
+    60 * 60 if SHARED_CACHE else PROCESS_LOCAL_CACHE_MAX_TIMEOUT
+)
+
+# Отложенная запись (posts.writebehind): комментарии и подписки копятся
+# в очереди процесса с журналом на диске и пишутся пачками раз в
+# POSTS_WRITE_BEHIND_INTERVAL секунд или по достижении
+# POSTS_WRITE_BEHIND_BATCH заявок. 0 в интервале -- только по размеру
+# пачки и при остановке. Журналы упавших процессов подхватывает
+# manage.py flush_write_behind. Журнал сбрасывается на диск (fsync)
+# раз в пачку, а не на каждую заявку: падение процесса заявок не теряет,
+# сбой ОС -- теряет принятые после последней записанной пачки
+POSTS_WRITE_BEHIND = False
+POSTS_WRITE_BEHIND_INTERVAL = 1.0
+POSTS_WRITE_BEHIND_BATCH = 500
+POSTS_WRITE_BEHIND_DIR = os.path.join(BASE_DIR, 'write_behind')
+
+# Замеры запросов: число и время обращений к базе, рендеринг шаблонов,
+# попадания в кэш. Сводка по представлениям пишется в лог
+# core.instrumentation раз в INSTRUMENTATION_FLUSH_INTERVAL секунд
+# и доступна персоналу по /instrumentation/
+INSTRUMENTATION_ENABLED = True
+INSTRUMENTATION_SERVER_TIMING = True
+INSTRUMENTATION_FLUSH_INTERVAL = 60
+
+# Бюджеты запросов представлений (core.budgets.query_budget): превышение
+# пишется в лог, а с QUERY_BUDGET_RAISE -- становится ошибкой. В тестах
+# pytest ошибку включает плагин core.pytest_plugin, он же проверяет, что
+# у всех адресов из QUERY_BUDGET_URLCONFS объявлен бюджет
+QUERY_BUDGET_RAISE = False
+QUERY_BUDGET_URLCONFS = ['posts.urls']